@@ -1,12 +1,64 @@
+import asyncio
 import discord
+import io
 from discord.ext import commands
 import os
+import time
+from collections import defaultdict
 from dotenv import load_dotenv
-from truth_bullets import TruthBulletManager, guild_managers
+from truth_bullets import guild_managers
+from bullet_pages import BulletPageView
+from role_index import role_holders
+from role_resolver import role_resolver
+from phase_permissions import apply_phase, confirm_overwrites, forget_channel
+from trial_state import trial_state
+from votes import VoteEngine
+from reaction_router import reaction_router
+from role_queue import role_update_queue
+from topic_writer import topic_writer
+from bulk_roles import clear_role
+from timer_wheel import TimerWheel
+from slash_commands import setup_slash_commands
+from metrics import metrics, current_command
+from truth_bullets import embed_cache
+from bullet_io import bullet_writer
+from bullet_storage import open_store
+from bullet_images import image_store
+from bullet_transfer import (BulletImportError, FORMATS as EXPORT_FORMATS, MAX_IMPORT_BYTES,
+                             MAX_REPORTED_ERRORS, detect_format, export_bullets, parse_bullets)
 
 # Load environment variables
 load_dotenv()
 
+# Truth bullet residency: BULLET_PRELOAD=1 loads every guild's bullets at startup,
+# otherwise managers load on first use and the least recently used are evicted
+BULLET_PRELOAD = os.getenv('BULLET_PRELOAD', '').lower() in ('1', 'true', 'yes')
+# Truth bullet storage: BULLET_STORAGE=sqlite keeps every guild in one database
+# (BULLET_DB_PATH), importing existing JSON files the first time; the default is JSON files
+bullet_store = open_store(os.getenv('BULLET_STORAGE', 'json').lower(),
+                          os.getenv('BULLET_DB_PATH', 'data/truth_bullets.db'))
+guild_managers.configure(
+    preload=BULLET_PRELOAD,
+    max_managers=int(os.getenv('BULLET_MAX_MANAGERS', '1000')),
+    max_bullets=int(os.getenv('BULLET_MAX_RESIDENT', '200000')),
+    store=bullet_store
+)
+
+# Truth bullet images are cached under BULLET_IMAGE_DIR, up to BULLET_IMAGE_CACHE_MB (0 turns
+# the cache off); BULLET_IMAGE_THUMBNAIL=<pixels> attaches downscaled copies (needs Pillow)
+image_store.configure(
+    directory=os.getenv('BULLET_IMAGE_DIR', 'data/images'),
+    max_bytes=int(os.getenv('BULLET_IMAGE_CACHE_MB', '512')) * 1024 * 1024,
+    thumbnail_size=int(os.getenv('BULLET_IMAGE_THUMBNAIL', '0'))
+)
+
+# SYNC_SLASH_COMMANDS=1 pushes the slash command definitions to Discord at startup;
+# only needed after they change, as syncing is heavily rate limited
+SYNC_SLASH_COMMANDS = os.getenv('SYNC_SLASH_COMMANDS', '').lower() in ('1', 'true', 'yes')
+
+# METRICS_FILE=data/metrics.prom writes Prometheus-format metrics there every 15 seconds
+METRICS_FILE = os.getenv('METRICS_FILE')
+
 # Bot configuration
 intents = discord.Intents.default()
 intents.message_content = True
@@ -18,17 +70,176 @@ bot = commands.Bot(
     case_insensitive=True  # Make commands case-insensitive
 )
 
-# Store the starred role ID for each guild
-starred_roles = {}
-
-# Store the refuter role ID for each guild
-refuter_roles = {}
+# Trial state is persisted by trial_state as ID-only records, so it survives restarts.
+# Roles and members are resolved from the gateway cache when a command needs them.
+# Everything is keyed by channel, so each channel can host its own trial.
+
+# Store the starred role ID for each channel
+starred_roles = trial_state.starred_roles
+
+# Store the refuter role ID for each channel
+refuter_roles = trial_state.refuter_roles
+
+# Store active votes for each channel
+active_votes = trial_state.active_votes
+
+# Store scrum debate information for each channel
+scrum_debates = trial_state.scrum_debates
+
+# Store timed phase deadlines (auto-swap, vote close, intermission end) for each channel
+deadlines = trial_state.deadlines
+
+# Store the channels currently in intermission
+intermissions = trial_state.intermissions
+
+# One lock per channel: commands in a trial run in order, different trials run in parallel
+channel_locks = defaultdict(asyncio.Lock)
+
+def trial_lock(channel_id):
+    return channel_locks[channel_id]
+
+def schedule_deadline(channel_id, kind, seconds, interval=None):
+    """Run a timed phase action for a channel after the given number of seconds"""
+    record = {'due': time.time() + seconds}
+    if interval:
+        record['interval'] = interval
+    deadlines.setdefault(channel_id, {})[kind] = record
+    deadline_wheel.schedule((channel_id, kind), record['due'])
+    trial_state.mark_dirty()
+
+def cancel_deadline(channel_id, kind):
+    deadline_wheel.cancel((channel_id, kind))
+    channel_deadlines = deadlines.get(channel_id)
+    if channel_deadlines and channel_deadlines.pop(kind, None) is not None:
+        if not channel_deadlines:
+            del deadlines[channel_id]
+        trial_state.mark_dirty()
+
+def leave_intermission(channel_id):
+    """Forget a channel's intermission once another phase takes over, so its timer can't unlock the channel"""
+    cancel_deadline(channel_id, 'resume')
+    if intermissions.pop(channel_id, None) is not None:
+        trial_state.mark_dirty()
+
+def get_deadline(channel_id, kind):
+    return deadlines.get(channel_id, {}).get(kind)
+
+async def on_deadline(key):
+    channel_id, kind = key
+    current_command.set(f'deadline:{kind}')
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        cancel_deadline(channel_id, kind)
+        return
 
-# Store active votes for each guild
-active_votes = {}
+    async with trial_lock(channel_id):
+        # A command may have handled or moved this deadline while we waited for the lock
+        record = get_deadline(channel_id, kind)
+        if record is None:
+            return
+        if record['due'] > time.time():
+            # Not due yet (moved by a command, or a clock adjustment): keep it on the wheel
+            deadline_wheel.schedule(key, record['due'])
+            return
+        if kind == 'swap':
+            await swap_turn(channel)
+        elif kind == 'endvote':
+            await close_vote(channel)
+        elif kind == 'resume':
+            await end_intermission(channel)
+
+# A single timer wheel drives every channel's deadlines
+deadline_wheel = TimerWheel(on_deadline)
+
+def restore_deadlines():
+    """Put persisted deadlines back on the wheel; overdue ones fire on the next tick"""
+    for channel_id, channel_deadlines in deadlines.items():
+        for kind, record in channel_deadlines.items():
+            deadline_wheel.schedule((channel_id, kind), record['due'])
+
+def trial_role_name(base_name, channel):
+    """Name of a trial role belonging to one channel's trial"""
+    return f"{base_name} ({channel.name})"
+
+def find_trial_role(guild, channel, base_name, role_id=None):
+    """Find a channel's trial role by its stored ID, falling back to its name"""
+    role = guild.get_role(role_id) if role_id else None
+    return role or role_resolver.get_named(guild, trial_role_name(base_name, channel))
+
+async def get_or_create_trial_role(guild, channel, base_name, color, reason, role_id=None):
+    """Return the channel's trial role and whether it had to be created"""
+    role = find_trial_role(guild, channel, base_name, role_id)
+    if role:
+        return role, False
+    role = await guild.create_role(name=trial_role_name(base_name, channel), color=color, reason=reason)
+    return role, True
+
+# Live vote counts, updated from reaction events
+vote_engine = VoteEngine(active_votes)
+
+async def clear_trial_role(role, status_msg=None, reason="Clearing trial role"):
+    """Remove a trial role from everyone holding it; returns the role, which may have been recreated"""
+    holders = role_holders.holders(role)
+    cleared, failed = await clear_role(role, holders, status_msg, reason=reason)
+    if cleared is not role:
+        role_holders.on_role_delete(role)
+        role_holders.reset(cleared)
+    else:
+        # Members whose removal failed still hold the role, and so do any who gained it meanwhile
+        still_holding = {member.id for member in failed}
+        for member in holders:
+            if member.id not in still_holding:
+                role_holders.discard(member, role)
+    return cleared
+
+def get_debate_roles(guild, debate_data):
+    """Resolve the Side A and Side B roles of a stored debate from the guild cache"""
+    return guild.get_role(debate_data['side_a_role_id']), guild.get_role(debate_data['side_b_role_id'])
+
+def register_gauges():
+    metrics.gauge('trialbot_active_votes', 'Open votes', lambda: len(active_votes))
+    metrics.gauge('trialbot_scrum_debates', 'Scrum Debates that have not ended',
+                  lambda: sum(not debate.get('ended') for debate in scrum_debates.values()))
+    metrics.gauge('trialbot_bullet_managers', 'Guilds with truth bullets in memory', lambda: len(guild_managers))
+    metrics.gauge('trialbot_bullets_resident', 'Truth bullets in memory',
+                  lambda: sum(len(manager.bullets) for manager in guild_managers.values()))
+    metrics.gauge('trialbot_bullet_writes_pending', 'Guilds with truth bullet changes not yet on disk',
+                  lambda: bullet_writer.pending)
+    metrics.gauge('trialbot_image_cache_bytes', 'Disk used by cached truth bullet images',
+                  lambda: image_store.total_bytes)
+    metrics.counter('trialbot_embed_cache_hits_total', 'Truth bullet embed cache hits', lambda: embed_cache.hits)
+    metrics.counter('trialbot_embed_cache_misses_total', 'Truth bullet embed cache misses', lambda: embed_cache.misses)
+    metrics.gauge('trialbot_role_queue_depth', 'Members with queued role updates', lambda: role_update_queue.depth)
+    metrics.gauge('trialbot_topic_writes_pending', 'Channels with a topic change waiting to be written',
+                  lambda: topic_writer.depth)
+    metrics.gauge('trialbot_reaction_routes', 'Messages whose reactions are handled', lambda: len(reaction_router))
+    metrics.gauge('trialbot_deadlines', 'Scheduled trial deadlines', lambda: len(deadline_wheel))
+    metrics.gauge('trialbot_gateway_latency_seconds', 'Gateway heartbeat latency',
+                  lambda: bot.latency if bot.latency == bot.latency else 0.0)
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.metrics_started = metrics.start_command(ctx.command.name)
+
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    if hasattr(ctx, 'metrics_started'):
+        metrics.end_command(ctx.command.name, ctx.metrics_started, failed=ctx.command_failed)
 
-# Store scrum debate information for each guild
-scrum_debates = {}
+@bot.event
+async def setup_hook():
+    metrics.instrument_http(bot.http)
+    register_gauges()
+    metrics.start(path=METRICS_FILE)
+    restore_reaction_routes()
+    await asyncio.to_thread(image_store.scan)
+    setup_slash_commands(bot)
+    if SYNC_SLASH_COMMANDS:
+        synced = await bot.tree.sync()
+        print(f'Synced {len(synced)} slash commands')
+    if BULLET_PRELOAD:
+        await guild_managers.preload()
+        print(f'Preloaded truth bullets for {len(guild_managers)} guilds')
 
 @bot.event
 async def on_ready():
@@ -38,6 +249,45 @@ async def on_ready():
     for guild in bot.guilds:
         print(f'Bot permissions in {guild.name}: {guild.me.guild_permissions}')
 
+    # Deadlines act on cached channels, so start them once the cache is ready
+    if not deadline_wheel.running:
+        restore_deadlines()
+        deadline_wheel.start()
+
+@bot.event
+async def on_member_update(before, after):
+    role_holders.on_member_update(before, after)
+
+@bot.event
+async def on_member_remove(member):
+    role_holders.on_member_remove(member)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    confirm_overwrites(after)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    forget_channel(channel)
+
+@bot.event
+async def on_guild_role_create(role):
+    role_resolver.invalidate(role.guild.id)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    role_resolver.invalidate(after.guild.id)
+
+@bot.event
+async def on_guild_role_delete(role):
+    role_holders.on_role_delete(role)
+    role_resolver.invalidate(role.guild.id)
+
+@bot.event
+async def on_guild_remove(guild):
+    role_holders.on_guild_remove(guild)
+    role_resolver.invalidate(guild.id)
+
 @bot.event
 async def on_command_error(ctx, error):
     if isinstance(error, commands.CommandNotFound):
@@ -54,129 +304,161 @@ async def on_command_error(ctx, error):
 @commands.bot_has_permissions(manage_roles=True, manage_channels=True)
 async def star(ctx, member: discord.Member):
     """Star a user, giving them speaking permissions while locking the channel for others"""
-    try:
-        # Check if the bot has the necessary permissions
-        if not ctx.guild.me.guild_permissions.manage_roles or not ctx.guild.me.guild_permissions.manage_channels:
-            await ctx.send("❌ I need both 'Manage Roles' and 'Manage Channels' permissions to do this!")
-            return
-
-        # Send initial status message
-        status_msg = await ctx.send("🔄 Starting star process...")
-        
-        # Check if the starred role exists, if not create it
-        starred_role = discord.utils.get(ctx.guild.roles, name="Starred Speaker")
-        if not starred_role:
-            starred_role = await ctx.guild.create_role(
-                name="Starred Speaker",
-                color=discord.Color.yellow(),
-                reason="Created for trial starring system"
+    async with trial_lock(ctx.channel.id):
+        try:
+            # Check if the bot has the necessary permissions
+            if not ctx.guild.me.guild_permissions.manage_roles or not ctx.guild.me.guild_permissions.manage_channels:
+                await ctx.send("❌ I need both 'Manage Roles' and 'Manage Channels' permissions to do this!")
+                return
+
+            # Send initial status message
+            status_msg = await ctx.send("🔄 Starting star process...")
+            
+            # Check if this channel's starred role exists, if not create it
+            starred_role, created = await get_or_create_trial_role(
+                ctx.guild, ctx.channel, "Starred Speaker", discord.Color.yellow(),
+                reason="Created for trial starring system", role_id=starred_roles.get(ctx.channel.id)
             )
-            starred_roles[ctx.guild.id] = starred_role.id
-            await status_msg.edit(content="🔄 Created Starred Speaker role, applying changes...")
-        
-        # Remove the starred role from all members who might have it
-        for guild_member in ctx.guild.members:
-            if starred_role in guild_member.roles:
-                await guild_member.remove_roles(starred_role)
-        
-        # Add the starred role to the specified member
-        await member.add_roles(starred_role)
-        
-        # Update channel permissions
-        channel = ctx.channel
-        
-        # Reset permissions for everyone
-        await channel.set_permissions(ctx.guild.default_role, 
-                                   send_messages=False,
-                                   reason="Starring system: Locking channel")
-        
-        # Allow the starred role to speak
-        await channel.set_permissions(starred_role, 
-                                   send_messages=True,
-                                   reason="Starring system: Allowing starred user to speak")
-        
-        # Make sure admins can still speak
-        admin_role = discord.utils.get(ctx.guild.roles, permissions=discord.Permissions(administrator=True))
-        if admin_role:
-            await channel.set_permissions(admin_role, 
-                                       send_messages=True,
-                                       reason="Starring system: Preserving admin permissions")
-        
-        await status_msg.edit(content=f"✅ {member.mention} has been starred! Only they and administrators can speak now.")
-
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to do this! Please check my role permissions.")
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+            if starred_roles.get(ctx.channel.id) != starred_role.id:
+                starred_roles[ctx.channel.id] = starred_role.id
+                trial_state.mark_dirty()
+            if created:
+                await status_msg.edit(content="🔄 Created Starred Speaker role, applying changes...")
+            
+            # Remove the starred role from the members who currently hold it
+            for holder in role_holders.holders(starred_role):
+                if holder.id != member.id:
+                    await holder.remove_roles(starred_role)
+                    role_holders.discard(holder, starred_role)
+            
+            # Add the starred role to the specified member
+            if starred_role not in member.roles:
+                await member.add_roles(starred_role)
+                role_holders.add(member, starred_role)
+            
+            # Lock the channel for everyone except the starred role and admins
+            admin_roles = role_resolver.admin_roles(ctx.guild)
+            await apply_phase(ctx.channel, {
+                ctx.guild.default_role: dict(send_messages=False),
+                starred_role: dict(send_messages=True),
+                **{role: dict(send_messages=True) for role in admin_roles},
+            }, reason="Starring system: Locking channel for starred speaker")
+            leave_intermission(ctx.channel.id)
+            
+            await status_msg.edit(content=f"✅ {member.mention} has been starred! Only they and administrators can speak now.")
+
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to do this! Please check my role permissions.")
+        except Exception as e:
+            await ctx.send(f"❌ An error occurred: {str(e)}")
 
 @bot.command(name='unstar')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_roles=True, manage_channels=True)
 async def unstar(ctx):
     """Remove star status and restore normal channel permissions"""
-    try:
-        # Send initial status message
-        status_msg = await ctx.send("🔄 Removing star status...")
-        
-        # Find the starred role
-        starred_role = discord.utils.get(ctx.guild.roles, name="Starred Speaker")
-        if not starred_role:
-            await status_msg.edit(content="❌ No starred role found!")
-            return
-        
-        # Remove the role from all members
-        for member in ctx.guild.members:
-            if starred_role in member.roles:
-                await member.remove_roles(starred_role)
-        
-        # Reset channel permissions
-        channel = ctx.channel
-        await channel.set_permissions(ctx.guild.default_role, 
-                                   send_messages=True,
-                                   reason="Starring system: Unlocking channel")
-        await channel.set_permissions(starred_role, 
-                                   overwrite=None,
-                                   reason="Starring system: Resetting starred role permissions")
-        
-        await status_msg.edit(content="✅ Channel has been unstarred! Everyone can speak again.")
-
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to do this! Please check my role permissions.")
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+    async with trial_lock(ctx.channel.id):
+        try:
+            # Send initial status message
+            status_msg = await ctx.send("🔄 Removing star status...")
+            
+            # Find this channel's starred role
+            starred_role = find_trial_role(ctx.guild, ctx.channel, "Starred Speaker", starred_roles.get(ctx.channel.id))
+            if not starred_role:
+                await status_msg.edit(content="❌ No starred role found!")
+                return
+            
+            # Reset channel permissions
+            await apply_phase(ctx.channel, {
+                ctx.guild.default_role: dict(send_messages=True),
+                starred_role: None,
+            }, reason="Starring system: Unlocking channel")
+            leave_intermission(ctx.channel.id)
+            
+            # Remove the role from the members who hold it
+            starred_role = await clear_trial_role(starred_role, status_msg, reason="Starring system: Removing star status")
+            if starred_roles.get(ctx.channel.id) != starred_role.id:
+                starred_roles[ctx.channel.id] = starred_role.id
+                trial_state.mark_dirty()
+            
+            await status_msg.edit(content="✅ Channel has been unstarred! Everyone can speak again.")
+
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to do this! Please check my role permissions.")
+        except Exception as e:
+            await ctx.send(f"❌ An error occurred: {str(e)}")
 
 # Example command
 @bot.command(name='ping')
 async def ping(ctx):
     await ctx.send(f'Pong! Latency: {round(bot.latency * 1000)}ms')
 
+@bot.command(name='stats')
+@commands.has_permissions(administrator=True)
+async def show_stats(ctx):
+    """Show command latency, REST usage, rate limits, event loop lag and state sizes"""
+    embed = discord.Embed(title="📊 Bot Stats", color=discord.Color.blue())
+
+    rest_calls = metrics.rest_calls_by_command()
+    slowest = sorted(metrics.command_latency.items(), key=lambda item: item[1].quantile(0.95), reverse=True)
+    lines = [
+        f"`{name}` ×{hist.count}: p50 {hist.quantile(0.5):.2f}s, p95 {hist.quantile(0.95):.2f}s, "
+        f"max {hist.max:.2f}s, {rest_calls.get(name, 0) / hist.count:.1f} REST/call"
+        for name, hist in slowest[:10]
+    ]
+    embed.add_field(name="Commands (slowest p95)", value="\n".join(lines) or "None yet", inline=False)
+
+    embed.add_field(name="REST", value=(
+        f"{sum(rest_calls.values())} calls, {sum(metrics.rest_seconds.values()):.1f}s waiting\n"
+        f"{sum(metrics.rate_limits.values())} × 429, {sum(metrics.bucket_waits.values())} held for a bucket, "
+        f"{metrics.rate_limit_wait_seconds:.1f}s rate limited, {metrics.global_rate_limits} global"
+    ), inline=False)
+
+    embed.add_field(name="Event loop", value=(
+        f"Lag {metrics.last_loop_lag * 1000:.1f}ms now, p99 {metrics.loop_lag.quantile(0.99) * 1000:.0f}ms, "
+        f"max {metrics.loop_lag.max * 1000:.0f}ms\nGateway {round(bot.latency * 1000)}ms"
+    ), inline=False)
+
+    reactions = [
+        f"{name}: {counter.per_second():.2f}/s ({counter.total} total)"
+        for name, counter in sorted(metrics.events.items())
+    ]
+    embed.add_field(name="Reactions (last minute)", value="\n".join(reactions) or "None yet", inline=False)
+
+    embed.add_field(name="State", value="\n".join(
+        f"{help_text}: {read()}" for name, (help_text, read) in sorted({**metrics.gauges, **metrics.counters}.items())
+        if name != 'trialbot_gateway_latency_seconds'
+    ), inline=False)
+    await ctx.send(embed=embed)
+
 @bot.command(name='addbullet')
 @commands.has_permissions(administrator=True)
 async def add_bullet(ctx, name: str, *, description: str):
     """Add a truth bullet. Usage: !addbullet <name> <description>"""
     # Get the image URL from attachment if it exists
     image_url = None
+    image_hash = None
     if ctx.message.attachments:
         image_url = ctx.message.attachments[0].url
+        # Keep a copy of the image, as attachment links expire
+        image_hash = await image_store.store(image_url)
 
-    # Get or create manager for this guild
-    if ctx.guild.id not in guild_managers:
-        guild_managers[ctx.guild.id] = TruthBulletManager(ctx.guild.id)
-    manager = guild_managers[ctx.guild.id]
+    # Get or load the manager for this guild
+    manager = await guild_managers.get(ctx.guild.id)
     
     # Add the bullet
-    bullet = manager.add_bullet(name, description, image_url)
-    await ctx.send(embed=bullet.to_embed())
+    bullet = manager.add_bullet(name, description, image_url, image_hash)
+    await ctx.send(**bullet.to_message())
 
 @bot.command(name='removebullet')
 @commands.has_permissions(administrator=True)
 async def remove_bullet(ctx, identifier: str):
     """Remove a truth bullet by ID or name. Usage: !removebullet <id_or_name>"""
-    if ctx.guild.id not in guild_managers:
+    manager = await guild_managers.get(ctx.guild.id)
+    if not manager.bullets:
         await ctx.send("❌ No truth bullets exist yet!")
         return
         
-    manager = guild_managers[ctx.guild.id]
     bullet = manager.get_bullet(identifier)
     
     if bullet is None:
@@ -191,151 +473,253 @@ async def remove_bullet(ctx, identifier: str):
 @bot.command(name='bullet')
 async def show_bullet(ctx, identifier: str):
     """Show a specific truth bullet by ID or name. Usage: !bullet <id_or_name>"""
-    if ctx.guild.id not in guild_managers:
+    manager = await guild_managers.get(ctx.guild.id)
+    if not manager.bullets:
         await ctx.send("❌ No truth bullets exist yet!")
         return
         
-    manager = guild_managers[ctx.guild.id]
-    bullet = manager.get_bullet(identifier)
+    bullet = manager.get_bullet(identifier, allow_prefix=True)
     
     if bullet is None:
-        await ctx.send("❌ Truth bullet not found!")
+        suggestions = manager.suggest(identifier)
+        if suggestions:
+            names = ", ".join(f"`{b.name}` (#{b.id})" for b in suggestions)
+            await ctx.send(f"❌ Truth bullet not found! Did you mean: {names}?")
+        else:
+            await ctx.send("❌ Truth bullet not found!")
         return
         
-    await ctx.send(embed=bullet.to_embed())
+    await ctx.send(**bullet.to_message())
 
 @bot.command(name='bullets')
-async def list_bullets(ctx):
-    """List all truth bullets"""
-    if ctx.guild.id not in guild_managers:
+async def list_bullets(ctx, page: int = 1):
+    """List all truth bullets, a page at a time. Usage: !bullets [page]"""
+    manager = await guild_managers.get(ctx.guild.id)
+    if not manager.bullets:
         await ctx.send("❌ No truth bullets exist yet!")
         return
         
-    manager = guild_managers[ctx.guild.id]
-    bullets = manager.get_all_bullets()
+    # Pages are rendered once per change to the bullets and reused until the next one
+    pages = manager.get_pages()
+    page = max(1, min(page, len(pages))) - 1
     
-    if not bullets:
-        await ctx.send("No truth bullets found!")
+    if len(pages) == 1:
+        await ctx.send(embed=pages[0])
         return
-        
-    # Create an embed to display all bullets
+    
+    view = BulletPageView(manager, page)
+    view.message = await ctx.send(embed=pages[page], view=view)
+
+@bot.command(name='searchbullets')
+async def search_bullets(ctx, *, query: str):
+    """Search truth bullet names and descriptions. Usage: !searchbullets <words>"""
+    manager = await guild_managers.get(ctx.guild.id)
+    if not manager.bullets:
+        await ctx.send("❌ No truth bullets exist yet!")
+        return
+
+    results = manager.search(query)
+
+    if not results:
+        await ctx.send(f"No truth bullets match \"{query}\"!")
+        return
+
     embed = discord.Embed(
-        title="Truth Bullets",
+        title=f"Truth Bullets matching \"{query[:200]}\"",
         color=discord.Color.gold()
     )
-    
-    for bullet in bullets:
+
+    for bullet, snippet in results:
+        if snippet is None:
+            snippet = bullet.description[:100] + "..." if len(bullet.description) > 100 else bullet.description
         embed.add_field(
             name=f"#{bullet.id}: {bullet.name}",
-            value=bullet.description[:100] + "..." if len(bullet.description) > 100 else bullet.description,
+            value=snippet,
             inline=False
         )
-    
+
     await ctx.send(embed=embed)
 
+@bot.command(name='importbullets')
+@commands.has_permissions(administrator=True)
+async def import_bullets(ctx):
+    """Add truth bullets from an attached .json, .jsonl or .csv file. Usage: !importbullets (with the file attached)"""
+    if not ctx.message.attachments:
+        await ctx.send("❌ Attach a .json, .jsonl or .csv file with name, description and optional image_url for each bullet!")
+        return
+
+    attachment = ctx.message.attachments[0]
+    if attachment.size > MAX_IMPORT_BYTES:
+        await ctx.send(f"❌ The file is too large! The limit is {MAX_IMPORT_BYTES // (1024 * 1024)} MB.")
+        return
+
+    try:
+        fmt = detect_format(attachment.filename)
+        data = await attachment.read()
+        # Bullets are parsed and validated one at a time, off the event loop
+        bullets, errors = await asyncio.to_thread(parse_bullets, io.BytesIO(data), fmt)
+    except BulletImportError as e:
+        await ctx.send(f"❌ {e}")
+        return
+    except discord.HTTPException:
+        await ctx.send("❌ Couldn't download the attachment!")
+        return
+
+    if errors:
+        # Nothing is imported unless the whole file is valid
+        listed = "\n".join(errors[:MAX_REPORTED_ERRORS])
+        more = f"\n...and {len(errors) - MAX_REPORTED_ERRORS} more" if len(errors) > MAX_REPORTED_ERRORS else ""
+        await ctx.send(f"❌ No bullets were imported, {len(errors)} are invalid:\n{listed}{more}")
+        return
+    if not bullets:
+        await ctx.send("❌ The file doesn't contain any truth bullets!")
+        return
+
+    # Imported images are cached like attached ones, as their links may expire too
+    urls = [bullet['image_url'] for bullet in bullets if bullet['image_url']]
+    if urls and image_store.enabled:
+        status_msg = await ctx.send(f"🔄 Caching {len(set(urls))} images...")
+        image_hashes = await image_store.store_many(urls)
+        for bullet in bullets:
+            bullet['image_hash'] = image_hashes.get(bullet['image_url'])
+        cached = sum(image_hash is not None for image_hash in image_hashes.values())
+        await status_msg.edit(content=f"🖼️ Cached {cached} of {len(image_hashes)} images.")
+
+    # Fetch the manager after the downloads, in case it was evicted meanwhile
+    manager = await guild_managers.get(ctx.guild.id)
+    added = manager.add_bullets(bullets)
+    await ctx.send(f"✅ Imported {len(added)} truth bullets (#{added[0].id}–#{added[-1].id})")
+
+@bot.command(name='exportbullets')
+@commands.has_permissions(administrator=True)
+async def export_bullets_command(ctx, fmt: str = 'json'):
+    """Download every truth bullet as a file. Usage: !exportbullets [json|jsonl|csv]"""
+    fmt = fmt.lower()
+    if fmt not in EXPORT_FORMATS:
+        await ctx.send("❌ Format must be json, jsonl or csv!")
+        return
+
+    manager = await guild_managers.get(ctx.guild.id)
+    if not manager.bullets:
+        await ctx.send("❌ No truth bullets exist yet!")
+        return
+
+    # Bullets are written out one at a time, spilling to disk for large guilds
+    bullets = manager.get_all_bullets()
+    spool = await asyncio.to_thread(export_bullets, (bullet.to_dict() for bullet in bullets), fmt)
+    # discord.File closes the spool once it has been sent
+    await ctx.send(f"📦 Exported {len(bullets)} truth bullets",
+                   file=discord.File(spool, filename=f"truth_bullets_{ctx.guild.id}.{fmt}"))
+
+def format_wait(seconds):
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    return f"{minutes}m {seconds}s" if minutes else f"{seconds}s"
+
+def topic_delay_note(wait):
+    if wait <= topic_writer.debounce:
+        return ""
+    return (f"\n⏳ The channel description updates in {format_wait(wait)}: "
+            f"Discord allows {topic_writer.edits} topic edits per {topic_writer.per // 60:.0f} minutes.")
+
 @bot.command(name='topic')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_channels=True)
 async def set_topic(ctx, *, topic: str):
     """Set the forced topic for the trial. Updates channel description. Usage: !topic <topic description>"""
     try:
-        # Get current channel topic/description
-        current_topic = ctx.channel.topic or ""
-        
-        # Check if there's already a forced topic section
-        if "【FORCED TOPIC】" in current_topic:
-            # Replace existing forced topic section
-            parts = current_topic.split("【FORCED TOPIC】")
-            if len(parts) > 1:
-                # Keep any content before the forced topic section
-                base_topic = parts[0].strip()
-                new_topic = f"{base_topic}\n\n【FORCED TOPIC】\n{topic}" if base_topic else f"【FORCED TOPIC】\n{topic}"
-            else:
-                new_topic = f"【FORCED TOPIC】\n{topic}"
-        else:
-            # Add forced topic section to existing topic
-            new_topic = f"{current_topic}\n\n【FORCED TOPIC】\n{topic}" if current_topic else f"【FORCED TOPIC】\n{topic}"
-
-        # Update channel topic
-        await ctx.channel.edit(topic=new_topic)
-        await ctx.send(f"✅ Forced topic set to: {topic}")
-
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to edit the channel description!")
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+        # The description is written in the background, as often as Discord's edit limit allows
+        wait = topic_writer.set(ctx.channel, topic)
+    except ValueError as e:
+        await ctx.send(f"❌ {e}")
+        return
+    await ctx.send(f"✅ Forced topic set to: {topic}{topic_delay_note(wait)}")
 
 @bot.command(name='cleartopic')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_channels=True)
 async def clear_topic(ctx):
     """Clear the forced topic from the channel description"""
-    try:
-        current_topic = ctx.channel.topic or ""
-        
-        if "【FORCED TOPIC】" in current_topic:
-            # Remove the forced topic section and any content after it
-            new_topic = current_topic.split("【FORCED TOPIC】")[0].strip()
-            await ctx.channel.edit(topic=new_topic)
-            await ctx.send("✅ Forced topic has been cleared!")
-        else:
-            await ctx.send("❌ No forced topic found in channel description!")
+    if topic_writer.forced_topic(ctx.channel) is None:
+        await ctx.send("❌ No forced topic found in channel description!")
+        return
+    wait = topic_writer.set(ctx.channel, None)
+    await ctx.send(f"✅ Forced topic has been cleared!{topic_delay_note(wait)}")
 
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to edit the channel description!")
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+@bot.command(name='topicqueue')
+@commands.has_permissions(administrator=True)
+async def topic_queue_status(ctx):
+    """Show channel topics waiting for Discord's edit limit"""
+    stats = topic_writer.stats()
+    lines = [
+        f"📝 Topic writer: {stats['depth']} pending, {stats['sent']} sent, "
+        f"{stats['merged']} merged, {stats['failed']} failed"
+    ]
+    for channel_id, state, wait in topic_writer.pending()[:15]:
+        forced = "clear the forced topic" if state.forced is None else f"\"{state.forced[:80]}\""
+        lines.append(f"<#{channel_id}>: {forced} in {format_wait(wait)}")
+    for channel_id, state in topic_writer.failures()[:5]:
+        lines.append(f"<#{channel_id}>: ❌ last update failed ({state.error})")
+    await ctx.send("\n".join(lines))
 
 @bot.command(name='intermission')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_channels=True)
-async def intermission(ctx):
-    """Start an intermission by locking the channel for everyone except administrators"""
-    try:
-        channel = ctx.channel
-        status_msg = await ctx.send("🔄 Starting intermission...")
-
-        # Lock channel for everyone
-        await channel.set_permissions(ctx.guild.default_role, 
-                                   send_messages=False,
-                                   view_channel=True,
-                                   reason="Trial intermission started")
-        
-        # Make sure admins can still speak
-        admin_role = discord.utils.get(ctx.guild.roles, permissions=discord.Permissions(administrator=True))
-        if admin_role:
-            await channel.set_permissions(admin_role, 
-                                       send_messages=True,
-                                       view_channel=True,
-                                       reason="Preserving admin permissions during intermission")
-
-        # Create and send intermission embed
-        embed = discord.Embed(
-            title="⏸️ INTERMISSION",
-            description="The trial is currently in intermission.\nOnly administrators can speak during this time.",
-            color=discord.Color.blue()
-        )
-        await status_msg.edit(content=None, embed=embed)
-
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to manage channel permissions!")
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+async def intermission(ctx, seconds: int = 0):
+    """Start an intermission by locking the channel for everyone except administrators. Usage: !intermission [seconds]"""
+    async with trial_lock(ctx.channel.id):
+        try:
+            status_msg = await ctx.send("🔄 Starting intermission...")
+
+            # Lock channel for everyone but admins
+            admin_roles = role_resolver.admin_roles(ctx.guild)
+            await apply_phase(ctx.channel, {
+                ctx.guild.default_role: dict(send_messages=False, view_channel=True),
+                **{role: dict(send_messages=True, view_channel=True) for role in admin_roles},
+            }, reason="Trial intermission started")
+            intermissions[ctx.channel.id] = {'started': time.time()}
+            trial_state.mark_dirty()
+
+            # End the intermission automatically if a length was given
+            description = "The trial is currently in intermission.\nOnly administrators can speak during this time."
+            if seconds > 0:
+                schedule_deadline(ctx.channel.id, 'resume', seconds)
+                description += f"\nThe trial resumes automatically in {seconds} seconds."
+            else:
+                cancel_deadline(ctx.channel.id, 'resume')
 
-@bot.command(name='resume')
-@commands.has_permissions(administrator=True)
-@commands.bot_has_permissions(manage_channels=True)
-async def resume(ctx):
-    """End the intermission and unlock the channel"""
+            # Create and send intermission embed
+            embed = discord.Embed(
+                title="⏸️ INTERMISSION",
+                description=description,
+                color=discord.Color.blue()
+            )
+            await status_msg.edit(content=None, embed=embed)
+
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to manage channel permissions!")
+        except Exception as e:
+            await ctx.send(f"❌ An error occurred: {str(e)}")
+
+async def end_intermission(channel, destination=None):
+    """End a channel's intermission and unlock it"""
+    # Commands reply through their ctx, so a slash command answers in its one followup;
+    # deadlines have no ctx and post in the channel
+    destination = destination or channel
+    cancel_deadline(channel.id, 'resume')
     try:
-        channel = ctx.channel
-        status_msg = await ctx.send("🔄 Ending intermission...")
+        # Another phase may have taken over since; its overwrites aren't ours to undo
+        if channel.id not in intermissions:
+            await destination.send("❌ The channel is not in intermission!")
+            return
+
+        status_msg = await destination.send("🔄 Ending intermission...")
 
         # Reset permissions for everyone
-        await channel.set_permissions(ctx.guild.default_role, 
-                                   send_messages=True,
-                                   view_channel=True,
-                                   reason="Trial intermission ended")
+        await apply_phase(channel, {
+            channel.guild.default_role: dict(send_messages=True, view_channel=True),
+        }, reason="Trial intermission ended")
+        del intermissions[channel.id]
+        trial_state.mark_dirty()
         
         # Create and send resume embed
         embed = discord.Embed(
@@ -346,427 +730,488 @@ async def resume(ctx):
         await status_msg.edit(content=None, embed=embed)
 
     except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to manage channel permissions!")
+        await destination.send("❌ I don't have permission to manage channel permissions!")
     except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+        await destination.send(f"❌ An error occurred: {str(e)}")
+
+@bot.command(name='resume')
+@commands.has_permissions(administrator=True)
+@commands.bot_has_permissions(manage_channels=True)
+async def resume(ctx):
+    """End the intermission and unlock the channel"""
+    async with trial_lock(ctx.channel.id):
+        await end_intermission(ctx.channel, ctx)
 
 @bot.command(name='refute')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_roles=True, manage_channels=True)
 async def refute(ctx, user1: discord.Member, user2: discord.Member):
     """Start a rebuttal between two users. Usage: !refute @user1 @user2"""
-    try:
-        # Send initial status message
-        status_msg = await ctx.send("🔄 Setting up rebuttal...")
-        
-        # Check if the refuter role exists, if not create it
-        refuter_role = discord.utils.get(ctx.guild.roles, name="Refuter")
-        if not refuter_role:
-            refuter_role = await ctx.guild.create_role(
-                name="Refuter",
-                color=discord.Color.red(),
-                reason="Created for trial rebuttal system"
+    async with trial_lock(ctx.channel.id):
+        try:
+            # Send initial status message
+            status_msg = await ctx.send("🔄 Setting up rebuttal...")
+            
+            # Check if this channel's refuter role exists, if not create it
+            refuter_role, created = await get_or_create_trial_role(
+                ctx.guild, ctx.channel, "Refuter", discord.Color.red(),
+                reason="Created for trial rebuttal system", role_id=refuter_roles.get(ctx.channel.id)
             )
-            refuter_roles[ctx.guild.id] = refuter_role.id
-            await status_msg.edit(content="🔄 Created Refuter role, applying changes...")
-        
-        # Remove the refuter role from all members who might have it
-        for member in ctx.guild.members:
-            if refuter_role in member.roles:
-                await member.remove_roles(refuter_role)
-        
-        # Add the refuter role to both specified users
-        await user1.add_roles(refuter_role)
-        await user2.add_roles(refuter_role)
-        
-        # Update channel permissions
-        channel = ctx.channel
-        
-        # Reset permissions for everyone
-        await channel.set_permissions(ctx.guild.default_role, 
-                                   send_messages=False,
-                                   view_channel=True,
-                                   reason="Rebuttal: Locking channel")
-        
-        # Allow the refuter role to speak
-        await channel.set_permissions(refuter_role, 
-                                   send_messages=True,
-                                   view_channel=True,
-                                   reason="Rebuttal: Allowing refuters to speak")
-        
-        # Make sure admins can still speak
-        admin_role = discord.utils.get(ctx.guild.roles, permissions=discord.Permissions(administrator=True))
-        if admin_role:
-            await channel.set_permissions(admin_role, 
-                                       send_messages=True,
-                                       view_channel=True,
-                                       reason="Rebuttal: Preserving admin permissions")
-        
-        # Create and send rebuttal embed
-        embed = discord.Embed(
-            title="⚔️ REBUTTAL IN PROGRESS",
-            description=f"A rebuttal has started between {user1.mention} and {user2.mention}.\nOnly they and administrators can speak during this time.",
-            color=discord.Color.red()
-        )
-        await status_msg.edit(content=None, embed=embed)
+            if refuter_roles.get(ctx.channel.id) != refuter_role.id:
+                refuter_roles[ctx.channel.id] = refuter_role.id
+                trial_state.mark_dirty()
+            if created:
+                await status_msg.edit(content="🔄 Created Refuter role, applying changes...")
+            
+            # Remove the refuter role from the members who currently hold it
+            for member in role_holders.holders(refuter_role):
+                if member.id not in (user1.id, user2.id):
+                    await member.remove_roles(refuter_role)
+                    role_holders.discard(member, refuter_role)
+            
+            # Add the refuter role to both specified users
+            for user in (user1, user2):
+                if refuter_role not in user.roles:
+                    await user.add_roles(refuter_role)
+                    role_holders.add(user, refuter_role)
+            
+            # Lock the channel for everyone except the refuters and admins
+            admin_roles = role_resolver.admin_roles(ctx.guild)
+            await apply_phase(ctx.channel, {
+                ctx.guild.default_role: dict(send_messages=False, view_channel=True),
+                refuter_role: dict(send_messages=True, view_channel=True),
+                **{role: dict(send_messages=True, view_channel=True) for role in admin_roles},
+            }, reason="Rebuttal: Locking channel for refuters")
+            leave_intermission(ctx.channel.id)
+            
+            # Create and send rebuttal embed
+            embed = discord.Embed(
+                title="⚔️ REBUTTAL IN PROGRESS",
+                description=f"A rebuttal has started between {user1.mention} and {user2.mention}.\nOnly they and administrators can speak during this time.",
+                color=discord.Color.red()
+            )
+            await status_msg.edit(content=None, embed=embed)
 
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to manage roles or channel permissions!")
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to manage roles or channel permissions!")
+        except Exception as e:
+            await ctx.send(f"❌ An error occurred: {str(e)}")
 
 @bot.command(name='endrefute')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_roles=True, manage_channels=True)
-async def end_refute(ctx):
-    """End the current rebuttal and start a vote to decide the winner"""
-    try:
-        # Send initial status message
-        status_msg = await ctx.send("🔄 Ending rebuttal...")
-        
-        # Find the refuter role and get the current refuters
-        refuter_role = discord.utils.get(ctx.guild.roles, name="Refuter")
-        if not refuter_role:
-            await status_msg.edit(content="❌ No refuter role found!")
-            return
-        
-        # Get the current refuters before removing roles
-        current_refuters = [member for member in ctx.guild.members if refuter_role in member.roles]
-        if len(current_refuters) != 2:
-            await ctx.send("❌ Could not find exactly 2 refuters!")
-            return
-        
-        # Remove the role from all members
-        for member in current_refuters:
-            await member.remove_roles(refuter_role)
-        
-        # Reset channel permissions
-        channel = ctx.channel
-        await channel.set_permissions(ctx.guild.default_role, 
-                                   send_messages=True,
-                                   view_channel=True,
-                                   reason="Rebuttal: Unlocking channel")
-        await channel.set_permissions(refuter_role, 
-                                   overwrite=None,
-                                   reason="Rebuttal: Resetting refuter role permissions")
-        
-        # Create voting embed
-        vote_embed = discord.Embed(
-            title="🗳️ REBUTTAL VOTE",
-            description=(
-                "The rebuttal has concluded! Vote for who made the better argument:\n\n"
-                f"1️⃣ {current_refuters[0].mention}\n"
-                f"2️⃣ {current_refuters[1].mention}\n\n"
-                "React with the corresponding number to vote!"
-            ),
-            color=discord.Color.blue()
-        )
-        vote_msg = await ctx.send(embed=vote_embed)
-        
-        # Add voting reactions
-        await vote_msg.add_reaction("1️⃣")
-        await vote_msg.add_reaction("2️⃣")
-        
-        # Store vote information
-        active_votes[ctx.guild.id] = {
-            'message_id': vote_msg.id,
-            'refuter1': current_refuters[0],
-            'refuter2': current_refuters[1],
-            'channel_id': ctx.channel.id
-        }
-
-    except discord.Forbidden:
-        await ctx.send("❌ I don't have permission to manage roles or channel permissions!")
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+async def end_refute(ctx, vote_seconds: int = 0):
+    """End the current rebuttal and start a vote to decide the winner. Usage: !endrefute [seconds to vote]"""
+    async with trial_lock(ctx.channel.id):
+        try:
+            # Send initial status message
+            status_msg = await ctx.send("🔄 Ending rebuttal...")
+            
+            # Find this channel's refuter role and get the current refuters
+            refuter_role = find_trial_role(ctx.guild, ctx.channel, "Refuter", refuter_roles.get(ctx.channel.id))
+            if not refuter_role:
+                await status_msg.edit(content="❌ No refuter role found!")
+                return
+            
+            # Get the current refuters before removing roles
+            current_refuters = role_holders.holders(refuter_role)
+            if len(current_refuters) != 2:
+                await ctx.send("❌ Could not find exactly 2 refuters!")
+                return
+            
+            # Remove the role from all members
+            for member in current_refuters:
+                await member.remove_roles(refuter_role)
+                role_holders.discard(member, refuter_role)
+            
+            # Reset channel permissions
+            await apply_phase(ctx.channel, {
+                ctx.guild.default_role: dict(send_messages=True, view_channel=True),
+                refuter_role: None,
+            }, reason="Rebuttal: Unlocking channel")
+            leave_intermission(ctx.channel.id)
+            
+            # Create voting embed
+            vote_embed = discord.Embed(
+                title="🗳️ REBUTTAL VOTE",
+                description=(
+                    "The rebuttal has concluded! Vote for who made the better argument:\n\n"
+                    f"1️⃣ {current_refuters[0].mention}\n"
+                    f"2️⃣ {current_refuters[1].mention}\n\n"
+                    "React with the corresponding number to vote!"
+                ),
+                color=discord.Color.blue()
+            )
+            vote_msg = await ctx.send(embed=vote_embed)
+            
+            # Store vote information, so votes count as soon as the message exists
+            open_vote(ctx.channel.id, {
+                'message_id': vote_msg.id,
+                'refuter1_id': current_refuters[0].id,
+                'refuter2_id': current_refuters[1].id,
+                'channel_id': ctx.channel.id
+            }, vote_seconds)
+            
+            # Add voting reactions
+            await vote_msg.add_reaction("1️⃣")
+            await vote_msg.add_reaction("2️⃣")
+
+        except discord.Forbidden:
+            await ctx.send("❌ I don't have permission to manage roles or channel permissions!")
+        except Exception as e:
+            await ctx.send(f"❌ An error occurred: {str(e)}")
 
 @bot.command(name='scrumdebate')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_roles=True, manage_channels=True)
 async def scrum_debate(ctx):
     """Start a Scrum Debate with Side A and Side B teams"""
-    try:
-        # Send initial setup message
-        setup_msg = await ctx.send("🔄 Setting up Scrum Debate...")
-
-        # Create Side A role if it doesn't exist
-        side_a_role = discord.utils.get(ctx.guild.roles, name="Side A")
-        if not side_a_role:
-            side_a_role = await ctx.guild.create_role(
-                name="Side A",
-                color=discord.Color.blue(),
-                reason="Created for Scrum Debate"
+    async with trial_lock(ctx.channel.id):
+        try:
+            # A newly queued debate replaces the previous one, including its automatic swaps
+            cancel_deadline(ctx.channel.id, 'swap')
+
+            # Send initial setup message
+            setup_msg = await ctx.send("🔄 Setting up Scrum Debate...")
+
+            previous = scrum_debates.get(ctx.channel.id, {})
+
+            # Create this channel's Side A role if it doesn't exist
+            side_a_role, _ = await get_or_create_trial_role(
+                ctx.guild, ctx.channel, "Side A", discord.Color.blue(),
+                reason="Created for Scrum Debate", role_id=previous.get('side_a_role_id')
             )
 
-        # Create Side B role if it doesn't exist
-        side_b_role = discord.utils.get(ctx.guild.roles, name="Side B")
-        if not side_b_role:
-            side_b_role = await ctx.guild.create_role(
-                name="Side B",
-                color=discord.Color.red(),
-                reason="Created for Scrum Debate"
+            # Create this channel's Side B role if it doesn't exist
+            side_b_role, _ = await get_or_create_trial_role(
+                ctx.guild, ctx.channel, "Side B", discord.Color.red(),
+                reason="Created for Scrum Debate", role_id=previous.get('side_b_role_id')
             )
 
-        # Create and send role selection message
-        role_embed = discord.Embed(
-            title="🗣️ SCRUM DEBATE TEAM SELECTION",
-            description=(
-                "React to join your side:\n\n"
-                "🔵 - Side A\n"
-                "🔴 - Side B\n\n"
-                "The debate will begin once the administrator uses !startscrum"
-            ),
-            color=discord.Color.gold()
-        )
-        role_msg = await ctx.send(embed=role_embed)
+            # Create and send role selection message
+            role_embed = discord.Embed(
+                title="🗣️ SCRUM DEBATE TEAM SELECTION",
+                description=(
+                    "React to join your side:\n\n"
+                    "🔵 - Side A\n"
+                    "🔴 - Side B\n\n"
+                    "The debate will begin once the administrator uses !startscrum"
+                ),
+                color=discord.Color.gold()
+            )
+            role_msg = await ctx.send(embed=role_embed)
+
+            # Store debate information and start routing team selection reactions
+            if previous:
+                reaction_router.unregister(previous['setup_message_id'])
+            reaction_router.register(role_msg.id, handle_team_selection)
+            scrum_debates[ctx.channel.id] = {
+                'setup_message_id': role_msg.id,
+                'channel_id': ctx.channel.id,
+                'side_a_role_id': side_a_role.id,
+                'side_b_role_id': side_b_role.id,
+                'active': False
+            }
+            trial_state.mark_dirty()
+
+            # Add reactions for role selection
+            await role_msg.add_reaction("🔵")
+            await role_msg.add_reaction("🔴")
+
+        except Exception as e:
+            await ctx.send(f"❌ An error occurred: {str(e)}")
+
+async def handle_team_selection(payload, added):
+    """Give members the Side A/Side B role for the reaction they pick on the selection message"""
+    if payload.user_id == bot.user.id:
+        return
 
-        # Add reactions for role selection
-        await role_msg.add_reaction("🔵")
-        await role_msg.add_reaction("🔴")
+    guild = bot.get_guild(payload.guild_id)
+    debate_data = scrum_debates.get(payload.channel_id)
+    if not guild or not debate_data:
+        return
 
-        # Store debate information
-        scrum_debates[ctx.guild.id] = {
-            'setup_message_id': role_msg.id,
-            'channel_id': ctx.channel.id,
-            'side_a_role': side_a_role,
-            'side_b_role': side_b_role,
-            'active': False
-        }
+    side_a_role, side_b_role = get_debate_roles(guild, debate_data)
+    if not side_a_role or not side_b_role:
+        return
 
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+    if str(payload.emoji) == "🔵":
+        joined, left = side_a_role, side_b_role
+    elif str(payload.emoji) == "🔴":
+        joined, left = side_b_role, side_a_role
+    else:
+        return
 
-@bot.event
-async def on_raw_reaction_add(payload):
+    # Changes are coalesced per member and sent as one role edit once they settle
+    if added:
+        role_update_queue.enqueue(guild, payload.user_id, add=[joined], remove=[left],
+                                  reason="Scrum Debate team selection")
+    else:
+        role_update_queue.enqueue(guild, payload.user_id, remove=[joined],
+                                  reason="Scrum Debate team selection")
+
+async def handle_vote_reaction(payload, added):
+    """Count a reaction on a vote message"""
     if payload.user_id == bot.user.id:
         return
 
-    guild = bot.get_guild(payload.guild_id)
-    if not guild:
-        return
+    emoji = str(payload.emoji)
+    if added:
+        changed = vote_engine.add(payload.channel_id, payload.message_id, payload.user_id, emoji)
+    else:
+        changed = vote_engine.remove(payload.channel_id, payload.message_id, payload.user_id, emoji)
+    if changed:
+        trial_state.mark_dirty()
+
+def open_vote(channel_id, vote_data, seconds=0):
+    """Start counting a channel's vote, replacing any earlier one; it closes itself after seconds if given"""
+    previous = active_votes.get(channel_id)
+    if previous:
+        reaction_router.unregister(previous['message_id'])
+    vote_engine.open(channel_id, vote_data)
+    reaction_router.register(vote_data['message_id'], handle_vote_reaction)
+    if seconds > 0:
+        schedule_deadline(channel_id, 'endvote', seconds)
+    else:
+        cancel_deadline(channel_id, 'endvote')
+    trial_state.mark_dirty()
 
-    # Check if this is a scrum debate role selection
-    if guild.id in scrum_debates and scrum_debates[guild.id]['setup_message_id'] == payload.message_id:
-        member = guild.get_member(payload.user_id)
-        if not member:
-            return
+def restore_reaction_routes():
+    """Re-register the messages of persisted debates and votes after a restart"""
+    for debate_data in scrum_debates.values():
+        if not debate_data.get('ended'):
+            reaction_router.register(debate_data['setup_message_id'], handle_team_selection)
+    for vote_data in active_votes.values():
+        reaction_router.register(vote_data['message_id'], handle_vote_reaction)
 
-        debate_data = scrum_debates[guild.id]
-        
-        if str(payload.emoji) == "🔵":
-            await member.add_roles(debate_data['side_a_role'])
-            # Remove from Side B if they're in it
-            await member.remove_roles(debate_data['side_b_role'])
-        elif str(payload.emoji) == "🔴":
-            await member.add_roles(debate_data['side_b_role'])
-            # Remove from Side A if they're in it
-            await member.remove_roles(debate_data['side_a_role'])
+@bot.event
+async def on_raw_reaction_add(payload):
+    metrics.event('reaction_add')
+    current_command.set('reaction_add')
+    # Reactions on messages nobody is watching stop at a single dict lookup
+    await reaction_router.dispatch(payload, added=True)
 
 @bot.event
 async def on_raw_reaction_remove(payload):
-    guild = bot.get_guild(payload.guild_id)
-    if not guild:
-        return
-
-    # Check if this is a scrum debate role selection
-    if guild.id in scrum_debates and scrum_debates[guild.id]['setup_message_id'] == payload.message_id:
-        member = guild.get_member(payload.user_id)
-        if not member:
-            return
+    metrics.event('reaction_remove')
+    current_command.set('reaction_remove')
+    await reaction_router.dispatch(payload, added=False)
 
-        debate_data = scrum_debates[guild.id]
-        
-        if str(payload.emoji) == "🔵":
-            await member.remove_roles(debate_data['side_a_role'])
-        elif str(payload.emoji) == "🔴":
-            await member.remove_roles(debate_data['side_b_role'])
+@bot.command(name='rolequeue')
+@commands.has_permissions(administrator=True)
+async def role_queue_status(ctx):
+    """Show the state of the team selection role queue"""
+    stats = role_update_queue.stats()
+    await ctx.send(
+        f"🔄 Role queue: {stats['depth']} pending, {stats['sent']} sent, "
+        f"{stats['merged']} merged, {stats['dropped']} dropped, {stats['failed']} failed"
+    )
 
 @bot.command(name='startscrum')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_roles=True, manage_channels=True)
-async def start_scrum(ctx):
-    """Start the Scrum Debate, muting Side B and allowing Side A to speak"""
-    try:
-        if ctx.guild.id not in scrum_debates:
-            await ctx.send("❌ No Scrum Debate has been set up! Use !scrumdebate first.")
-            return
-
-        debate_data = scrum_debates[ctx.guild.id]
-        channel = ctx.channel
-
-        # Set permissions for Side A (can speak)
-        await channel.set_permissions(debate_data['side_a_role'],
-                                   send_messages=True,
-                                   view_channel=True,
-                                   reason="Scrum Debate: Side A's turn")
-
-        # Set permissions for Side B (muted)
-        await channel.set_permissions(debate_data['side_b_role'],
-                                   send_messages=False,
-                                   view_channel=True,
-                                   reason="Scrum Debate: Side B muted")
+async def start_scrum(ctx, turn_seconds: int = 0):
+    """Start the Scrum Debate, muting Side B and allowing Side A to speak. Usage: !startscrum [seconds per turn]"""
+    async with trial_lock(ctx.channel.id):
+        try:
+            if ctx.channel.id not in scrum_debates:
+                await ctx.send("❌ No Scrum Debate has been set up! Use !scrumdebate first.")
+                return
+
+            debate_data = scrum_debates[ctx.channel.id]
+            side_a_role, side_b_role = get_debate_roles(ctx.guild, debate_data)
+            if not side_a_role or not side_b_role:
+                await ctx.send("❌ The Side A or Side B role no longer exists! Use !scrumdebate again.")
+                return
+
+            # Side A can speak, Side B is muted
+            await apply_phase(ctx.channel, {
+                side_a_role: dict(send_messages=True, view_channel=True),
+                side_b_role: dict(send_messages=False, view_channel=True),
+            }, reason="Scrum Debate: Side A's turn")
+            leave_intermission(ctx.channel.id)
+
+            # Update debate status
+            debate_data['active'] = True
+            debate_data['current_side'] = 'A'
+            trial_state.mark_dirty()
 
-        # Update debate status
-        debate_data['active'] = True
-        debate_data['current_side'] = 'A'
+            # Swap sides automatically if a turn length was given
+            description = "Side A can now speak. Side B is muted.\nUse !swap to switch sides."
+            if turn_seconds > 0:
+                schedule_deadline(ctx.channel.id, 'swap', turn_seconds, interval=turn_seconds)
+                description += f"\nSides swap automatically every {turn_seconds} seconds."
+            else:
+                cancel_deadline(ctx.channel.id, 'swap')
 
-        # Send status message
-        embed = discord.Embed(
-            title="🗣️ SCRUM DEBATE STARTED",
-            description="Side A can now speak. Side B is muted.\nUse !swap to switch sides.",
-            color=discord.Color.blue()
-        )
-        await ctx.send(embed=embed)
+            # Send status message
+            embed = discord.Embed(
+                title="🗣️ SCRUM DEBATE STARTED",
+                description=description,
+                color=discord.Color.blue()
+            )
+            await ctx.send(embed=embed)
 
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+        except Exception as e:
+            await ctx.send(f"❌ An error occurred: {str(e)}")
 
-@bot.command(name='swap')
-@commands.has_permissions(administrator=True)
-@commands.bot_has_permissions(manage_roles=True, manage_channels=True)
-async def swap_sides(ctx):
-    """Swap which side can speak in the Scrum Debate"""
+async def swap_turn(channel, destination=None):
+    """Give the floor to the other side of a channel's Scrum Debate"""
+    destination = destination or channel
     try:
-        if ctx.guild.id not in scrum_debates or not scrum_debates[ctx.guild.id]['active']:
-            await ctx.send("❌ No active Scrum Debate found!")
+        if channel.id not in scrum_debates or not scrum_debates[channel.id]['active']:
+            # Nothing to swap, so stop any automatic swapping left behind
+            cancel_deadline(channel.id, 'swap')
+            await destination.send("❌ No active Scrum Debate found!")
             return
 
-        debate_data = scrum_debates[ctx.guild.id]
-        channel = ctx.channel
+        debate_data = scrum_debates[channel.id]
+        side_a_role, side_b_role = get_debate_roles(channel.guild, debate_data)
+        if not side_a_role or not side_b_role:
+            cancel_deadline(channel.id, 'swap')
+            await destination.send("❌ The Side A or Side B role no longer exists! Use !scrumdebate again.")
+            return
 
         if debate_data['current_side'] == 'A':
             # Swap to Side B
-            await channel.set_permissions(debate_data['side_a_role'],
-                                       send_messages=False,
-                                       view_channel=True,
-                                       reason="Scrum Debate: Side A muted")
-            await channel.set_permissions(debate_data['side_b_role'],
-                                       send_messages=True,
-                                       view_channel=True,
-                                       reason="Scrum Debate: Side B's turn")
+            await apply_phase(channel, {
+                side_a_role: dict(send_messages=False, view_channel=True),
+                side_b_role: dict(send_messages=True, view_channel=True),
+            }, reason="Scrum Debate: Side B's turn")
             debate_data['current_side'] = 'B'
             color = discord.Color.red()
             description = "Side B can now speak. Side A is muted."
         else:
             # Swap to Side A
-            await channel.set_permissions(debate_data['side_b_role'],
-                                       send_messages=False,
-                                       view_channel=True,
-                                       reason="Scrum Debate: Side B muted")
-            await channel.set_permissions(debate_data['side_a_role'],
-                                       send_messages=True,
-                                       view_channel=True,
-                                       reason="Scrum Debate: Side A's turn")
+            await apply_phase(channel, {
+                side_a_role: dict(send_messages=True, view_channel=True),
+                side_b_role: dict(send_messages=False, view_channel=True),
+            }, reason="Scrum Debate: Side A's turn")
             debate_data['current_side'] = 'A'
             color = discord.Color.blue()
             description = "Side A can now speak. Side B is muted."
+        trial_state.mark_dirty()
+
+        # Each swap, manual or automatic, starts a full turn for the next side
+        swap_deadline = get_deadline(channel.id, 'swap')
+        if swap_deadline:
+            schedule_deadline(channel.id, 'swap', swap_deadline['interval'], interval=swap_deadline['interval'])
 
         embed = discord.Embed(
             title="🔄 SIDES SWAPPED",
             description=description,
             color=color
         )
-        await ctx.send(embed=embed)
+        await destination.send(embed=embed)
 
     except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+        # If the swap failed before the next turn was scheduled, the timer has stopped;
+        # drop its record rather than leaving it to fire again after a restart
+        note = ""
+        if get_deadline(channel.id, 'swap') is not None and (channel.id, 'swap') not in deadline_wheel:
+            cancel_deadline(channel.id, 'swap')
+            note = " Automatic swapping has stopped; use !startscrum again to restart it."
+        await destination.send(f"❌ An error occurred: {str(e)}{note}")
 
-@bot.command(name='endscrum')
+@bot.command(name='swap')
 @commands.has_permissions(administrator=True)
 @commands.bot_has_permissions(manage_roles=True, manage_channels=True)
-async def end_scrum(ctx):
-    """End the Scrum Debate and start a vote"""
-    try:
-        if ctx.guild.id not in scrum_debates or not scrum_debates[ctx.guild.id]['active']:
-            await ctx.send("❌ No active Scrum Debate found!")
-            return
-
-        debate_data = scrum_debates[ctx.guild.id]
-        channel = ctx.channel
-
-        # Reset channel permissions
-        await channel.set_permissions(debate_data['side_a_role'],
-                                   overwrite=None,
-                                   reason="Scrum Debate: Ending debate")
-        await channel.set_permissions(debate_data['side_b_role'],
-                                   overwrite=None,
-                                   reason="Scrum Debate: Ending debate")
-
-        # Get all members with the roles
-        side_a_members = debate_data['side_a_role'].members
-        side_b_members = debate_data['side_b_role'].members
-
-        # Remove roles from all members
-        for member in side_a_members:
-            await member.remove_roles(debate_data['side_a_role'])
-        for member in side_b_members:
-            await member.remove_roles(debate_data['side_b_role'])
-
-        # Create voting embed
-        vote_embed = discord.Embed(
-            title="🗳️ SCRUM DEBATE VOTE",
-            description=(
-                "The Scrum Debate has concluded! Vote for which side made the better argument:\n\n"
-                "🔵 - Side A\n"
-                "🔴 - Side B\n\n"
-                "React to cast your vote!"
-            ),
-            color=discord.Color.gold()
-        )
-        vote_msg = await ctx.send(embed=vote_embed)
-
-        # Add voting reactions
-        await vote_msg.add_reaction("🔵")
-        await vote_msg.add_reaction("🔴")
-
-        # Store vote information
-        active_votes[ctx.guild.id] = {
-            'message_id': vote_msg.id,
-            'channel_id': ctx.channel.id,
-            'type': 'scrum',
-            'side_a_role': debate_data['side_a_role'],
-            'side_b_role': debate_data['side_b_role']
-        }
-
-        # Clean up debate data
-        scrum_debates[ctx.guild.id]['active'] = False
-
-    except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+async def swap_sides(ctx):
+    """Swap which side can speak in the Scrum Debate"""
+    async with trial_lock(ctx.channel.id):
+        await swap_turn(ctx.channel, ctx)
 
-@bot.command(name='endvote')
+@bot.command(name='endscrum')
 @commands.has_permissions(administrator=True)
-async def end_vote(ctx):
-    """End the current vote and announce the winner"""
-    try:
-        if ctx.guild.id not in active_votes:
-            await ctx.send("❌ No active vote found!")
-            return
-
-        vote_data = active_votes[ctx.guild.id]
-        channel = ctx.guild.get_channel(vote_data['channel_id'])
-        
+@commands.bot_has_permissions(manage_roles=True, manage_channels=True)
+async def end_scrum(ctx, vote_seconds: int = 0):
+    """End the Scrum Debate and start a vote. Usage: !endscrum [seconds to vote]"""
+    async with trial_lock(ctx.channel.id):
+        # Automatic swapping ends with the debate, even if ending it fails below
+        cancel_deadline(ctx.channel.id, 'swap')
         try:
-            vote_msg = await channel.fetch_message(vote_data['message_id'])
-        except:
-            await ctx.send("❌ Could not find the vote message!")
+            if ctx.channel.id not in scrum_debates or not scrum_debates[ctx.channel.id]['active']:
+                await ctx.send("❌ No active Scrum Debate found!")
+                return
+
+            debate_data = scrum_debates[ctx.channel.id]
+            side_a_role, side_b_role = get_debate_roles(ctx.guild, debate_data)
+            if not side_a_role or not side_b_role:
+                await ctx.send("❌ The Side A or Side B role no longer exists! Use !scrumdebate again.")
+                return
+
+            # Reset channel permissions
+            await apply_phase(ctx.channel, {
+                side_a_role: None,
+                side_b_role: None,
+            }, reason="Scrum Debate: Ending debate")
+            leave_intermission(ctx.channel.id)
+
+            # Stop team selection before clearing, so no queued or late pick hands a side role back
+            reaction_router.unregister(debate_data['setup_message_id'])
+            late_picks = await role_update_queue.cancel_roles(ctx.guild, (side_a_role.id, side_b_role.id))
+            for member_id, role_ids in late_picks.items():
+                member = ctx.guild.get_member(member_id)
+                for role in (side_a_role, side_b_role):
+                    if member is not None and role.id in role_ids:
+                        role_holders.add(member, role)
+
+            # Remove roles from all members, reporting progress for large debates
+            status_msg = await ctx.send("🔄 Clearing Side A and Side B roles...")
+            side_a_role = await clear_trial_role(side_a_role, status_msg, reason="Scrum Debate: Ending debate")
+            side_b_role = await clear_trial_role(side_b_role, status_msg, reason="Scrum Debate: Ending debate")
+            debate_data['side_a_role_id'] = side_a_role.id
+            debate_data['side_b_role_id'] = side_b_role.id
+            await status_msg.edit(content="✅ Scrum Debate roles cleared.")
+
+            # Create voting embed
+            vote_embed = discord.Embed(
+                title="🗳️ SCRUM DEBATE VOTE",
+                description=(
+                    "The Scrum Debate has concluded! Vote for which side made the better argument:\n\n"
+                    "🔵 - Side A\n"
+                    "🔴 - Side B\n\n"
+                    "React to cast your vote!"
+                ),
+                color=discord.Color.gold()
+            )
+            vote_msg = await ctx.send(embed=vote_embed)
+
+            # Store vote information, so votes count as soon as the message exists
+            open_vote(ctx.channel.id, {
+                'message_id': vote_msg.id,
+                'channel_id': ctx.channel.id,
+                'type': 'scrum',
+                'side_a_role_id': side_a_role.id,
+                'side_b_role_id': side_b_role.id
+            }, vote_seconds)
+
+            # Clean up debate data
+            scrum_debates[ctx.channel.id]['active'] = False
+            scrum_debates[ctx.channel.id]['ended'] = True
+            trial_state.mark_dirty()
+
+            # Add voting reactions
+            await vote_msg.add_reaction("🔵")
+            await vote_msg.add_reaction("🔴")
+
+        except Exception as e:
+            await ctx.send(f"❌ An error occurred: {str(e)}")
+
+async def close_vote(channel, destination=None):
+    """Close a channel's vote and announce the winner"""
+    destination = destination or channel
+    cancel_deadline(channel.id, 'endvote')
+    try:
+        if channel.id not in active_votes:
+            await destination.send("❌ No active vote found!")
             return
 
-        # Count reactions
-        votes_a = 0
-        votes_b = 0
-
-        for reaction in vote_msg.reactions:
-            if vote_data.get('type') == 'scrum':
-                if str(reaction.emoji) == "🔵":
-                    votes_a = reaction.count - 1
-                elif str(reaction.emoji) == "🔴":
-                    votes_b = reaction.count - 1
-            else:  # Regular refute vote
-                if str(reaction.emoji) == "1️⃣":
-                    votes_a = reaction.count - 1
-                elif str(reaction.emoji) == "2️⃣":
-                    votes_b = reaction.count - 1
+        vote_data = active_votes[channel.id]
+        refuter1_mention = f"<@{vote_data.get('refuter1_id')}>"
+        refuter2_mention = f"<@{vote_data.get('refuter2_id')}>"
+        # Counts are kept live from reaction events, so no message fetch is needed
+        votes_a, votes_b = vote_engine.tally(channel.id)
 
         # Create results embed
         if vote_data.get('type') == 'scrum':
@@ -802,10 +1247,10 @@ async def end_vote(ctx):
                 )
         else:  # Regular refute vote results
             if votes_a > votes_b:
-                winner = vote_data['refuter1']
+                winner = refuter1_mention
                 color = discord.Color.gold()
             elif votes_b > votes_a:
-                winner = vote_data['refuter2']
+                winner = refuter2_mention
                 color = discord.Color.gold()
             else:
                 winner = None
@@ -815,9 +1260,9 @@ async def end_vote(ctx):
                 results_embed = discord.Embed(
                     title="🏆 REBUTTAL RESULTS",
                     description=(
-                        f"**Winner: {winner.mention}**\n\n"
-                        f"{vote_data['refuter1'].mention}: {votes_a} votes\n"
-                        f"{vote_data['refuter2'].mention}: {votes_b} votes"
+                        f"**Winner: {winner}**\n\n"
+                        f"{refuter1_mention}: {votes_a} votes\n"
+                        f"{refuter2_mention}: {votes_b} votes"
                     ),
                     color=color
                 )
@@ -826,23 +1271,62 @@ async def end_vote(ctx):
                     title="🤝 REBUTTAL RESULTS - TIE",
                     description=(
                         f"The vote ended in a tie!\n\n"
-                        f"{vote_data['refuter1'].mention}: {votes_a} votes\n"
-                        f"{vote_data['refuter2'].mention}: {votes_b} votes"
+                        f"{refuter1_mention}: {votes_a} votes\n"
+                        f"{refuter2_mention}: {votes_b} votes"
                     ),
                     color=color
                 )
 
-        await ctx.send(embed=results_embed)
+        await destination.send(embed=results_embed)
         
         # Clean up
-        del active_votes[ctx.guild.id]
+        reaction_router.unregister(vote_data['message_id'])
+        del active_votes[channel.id]
+        trial_state.mark_dirty()
 
     except Exception as e:
-        await ctx.send(f"❌ An error occurred: {str(e)}")
+        await destination.send(f"❌ An error occurred: {str(e)}")
+
+@bot.command(name='endvote')
+@commands.has_permissions(administrator=True)
+async def end_vote(ctx):
+    """End the current vote and announce the winner"""
+    async with trial_lock(ctx.channel.id):
+        await close_vote(ctx.channel, ctx)
+
+@bot.command(name='tally')
+async def show_tally(ctx):
+    """Show the running count of the current vote"""
+    if ctx.channel.id not in active_votes:
+        await ctx.send("❌ No active vote found!")
+        return
+
+    vote_data = active_votes[ctx.channel.id]
+    votes_a, votes_b = vote_engine.tally(ctx.channel.id)
+    if vote_data.get('type') == 'scrum':
+        description = f"Side A 🔵: {votes_a} votes\nSide B 🔴: {votes_b} votes"
+    else:
+        description = (
+            f"<@{vote_data.get('refuter1_id')}>: {votes_a} votes\n"
+            f"<@{vote_data.get('refuter2_id')}>: {votes_b} votes"
+        )
+
+    embed = discord.Embed(
+        title="🗳️ CURRENT TALLY",
+        description=description,
+        color=discord.Color.blue()
+    )
+    await ctx.send(embed=embed)
 
 # Run the bot
 if __name__ == "__main__":
     token = os.getenv('DISCORD_TOKEN')
     if not token:
         raise ValueError("No token found. Make sure to set DISCORD_TOKEN in your .env file")
-    bot.run(token)
+    try:
+        bot.run(token)
+    finally:
+        # Write out any buffered trial state and truth bullets before exiting
+        trial_state.flush()
+        bullet_writer.close()
+        bullet_store.close()
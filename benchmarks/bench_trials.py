@@ -0,0 +1,189 @@
+"""Benchmark the trial commands and reaction handlers against a simulated Discord.
+
+Usage: python -m benchmarks.bench_trials [--members 100 1000 10000 100000] [--reactors 200]
+                                         [--latency 0.05] [--time-scale 0.01] [--json results.json]
+
+Each operation reports wall time, CPU time, REST calls, rate limit waits and an
+estimate of how long it would take live (simulated waits at full length).
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, asdict, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from benchmarks.fake_discord import FakeDiscord
+
+@dataclass
+class Result:
+    members: int
+    operation: str
+    wall: float
+    cpu: float
+    rest_calls: int
+    rate_limited: int
+    live_estimate: float
+    routes: Dict[str, int] = field(default_factory=dict)
+    # Per-event latencies, for operations that replay many events
+    p50: Optional[float] = None
+    p99: Optional[float] = None
+
+class BenchContext:
+    """The parts of commands.Context the command bodies use"""
+
+    def __init__(self, bot, guild, channel, author):
+        self.bot = bot
+        self.guild = guild
+        self.channel = channel
+        self.author = author
+        self.message = SimpleNamespace(attachments=[])
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+async def settle():
+    """Wait for the event handlers and workers the last operation started"""
+    current = asyncio.current_task()
+    while True:
+        pending = [task for task in asyncio.all_tasks() if task is not current and not task.done()]
+        if not pending:
+            return
+        await asyncio.wait(pending)
+
+class Benchmark:
+    def __init__(self, main, fake: FakeDiscord, member_count: int):
+        self.main = main
+        self.fake = fake
+        self.member_count = member_count
+        self.results: List[Result] = []
+
+    async def measure(self, operation: str, run, per_event: Optional[List[float]] = None):
+        self.fake.reset_counters()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        await run()
+        await settle()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        # Simulated waits were shortened by time_scale; CPU time was not
+        waited = max(0.0, wall - cpu)
+        result = Result(
+            members=self.member_count, operation=operation, wall=wall, cpu=cpu,
+            rest_calls=self.fake.total_calls, rate_limited=self.fake.limited,
+            live_estimate=cpu + waited / self.fake.time_scale, routes=dict(self.fake.calls),
+        )
+        if per_event:
+            ordered = sorted(per_event)
+            result.p50 = statistics.median(ordered)
+            result.p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        self.results.append(result)
+        print(format_result(result), flush=True)
+
+    async def command(self, ctx, name: str, *args):
+        await self.main.bot.get_command(name).callback(ctx, *args)
+
+    async def react(self, message_id: int, reactions, latencies: List[float]):
+        for user_id, emoji in reactions:
+            payload = self.fake.reaction_payload(message_id, user_id, emoji)
+            start = time.perf_counter()
+            await self.main.on_raw_reaction_add(payload)
+            latencies.append(time.perf_counter() - start)
+
+    async def run(self, reactors: int):
+        main = self.main
+        bot = main.bot
+        guild = self.fake.build_guild(self.member_count)
+        channel = guild.text_channels[0]
+        members = [member for member in guild.members if not member.bot]
+        ctx = BenchContext(bot, guild, channel, members[0])
+        voters = members[1:reactors + 1]
+
+        await self.measure('star', lambda: self.command(ctx, 'star', members[1]))
+        await self.measure('unstar', lambda: self.command(ctx, 'unstar'))
+        await self.measure('refute', lambda: self.command(ctx, 'refute', members[1], members[2]))
+        await self.measure('endrefute', lambda: self.command(ctx, 'endrefute'))
+
+        latencies = []
+        vote_id = main.active_votes[channel.id]['message_id']
+        votes = [(member.id, "1️⃣" if n % 2 else "2️⃣") for n, member in enumerate(voters)]
+        await self.measure(f'vote reactions x{len(votes)}',
+                           lambda: self.react(vote_id, votes, latencies), latencies)
+        await self.measure('endvote', lambda: self.command(ctx, 'endvote'))
+
+        await self.measure('scrumdebate', lambda: self.command(ctx, 'scrumdebate'))
+        latencies = []
+        setup_id = main.scrum_debates[channel.id]['setup_message_id']
+        picks = [(member.id, "🔵" if n % 2 else "🔴") for n, member in enumerate(voters)]
+        await self.measure(f'team reactions x{len(picks)}',
+                           lambda: self.react(setup_id, picks, latencies), latencies)
+        await self.measure('startscrum', lambda: self.command(ctx, 'startscrum'))
+        await self.measure('swap', lambda: self.command(ctx, 'swap'))
+        await self.measure('endscrum', lambda: self.command(ctx, 'endscrum'))
+        await self.measure('endvote', lambda: self.command(ctx, 'endvote'))
+
+HEADER = f"{'members':>8}  {'operation':<22}{'wall ms':>10}{'cpu ms':>10}{'REST':>7}{'limited':>9}{'live s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+
+def format_result(result: Result) -> str:
+    p50 = f'{result.p50 * 1000:.3f}' if result.p50 is not None else '-'
+    p99 = f'{result.p99 * 1000:.3f}' if result.p99 is not None else '-'
+    return (f'{result.members:>8}  {result.operation:<22}{result.wall * 1000:>10.1f}{result.cpu * 1000:>10.1f}'
+            f'{result.rest_calls:>7}{result.rate_limited:>9}{result.live_estimate:>9.2f}{p50:>9}{p99:>9}')
+
+async def prepare(latency: float, time_scale: float):
+    """Import the bot and connect it to a FakeDiscord. Returns (Main module, FakeDiscord)."""
+    import Main as main
+    from role_queue import role_update_queue
+    from trial_state import trial_state
+
+    # Keep benchmark state away from the bot's real data
+    state_dir = tempfile.mkdtemp(prefix='trial-bench-')
+    trial_state.path = os.path.join(state_dir, 'trial_state.json')
+    for table in trial_state.TABLES:
+        getattr(trial_state, table).clear()
+
+    await main.bot._async_setup_hook()
+    fake = FakeDiscord(main.bot, latency=latency, time_scale=time_scale)
+
+    # The role queue paces itself in real time, so it runs on the simulated clock too
+    role_update_queue.debounce *= time_scale
+    role_update_queue.rate /= time_scale
+    return main, fake
+
+async def run_benchmarks(args) -> List[Result]:
+    from trial_state import trial_state
+    main, fake = await prepare(args.latency, args.time_scale)
+
+    print(HEADER)
+    results = []
+    for member_count in args.members:
+        for table in trial_state.TABLES:
+            getattr(trial_state, table).clear()
+        bench = Benchmark(main, fake, member_count)
+        await bench.run(min(args.reactors, member_count - 2))
+        results.extend(bench.results)
+    trial_state.flush()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='guild sizes to run at')
+    parser.add_argument('--reactors', type=int, default=200, help='members reacting to each vote and team selection')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated REST latency in seconds')
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                        help='real seconds per simulated second for latency and rate limit waits')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(args))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+
+if __name__ == '__main__':
+    main()
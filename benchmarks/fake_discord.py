@@ -0,0 +1,294 @@
+import asyncio
+import datetime
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import discord
+
+# Approximate per-route limits as (requests, per seconds); Discord does not
+# publish exact numbers, these follow what its response headers usually report
+DEFAULT_LIMITS = {
+    'POST /channels/{channel_id}/messages': (5, 5.0),
+    'PATCH /channels/{channel_id}/messages/{message_id}': (5, 5.0),
+    'PUT /channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me': (1, 0.25),
+    'PATCH /channels/{channel_id}': (5, 5.0),
+    'POST /guilds/{guild_id}/roles': (10, 10.0),
+    'PATCH /guilds/{guild_id}/roles': (10, 10.0),
+    'DELETE /guilds/{guild_id}/roles/{role_id}': (10, 10.0),
+    'PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}': (10, 10.0),
+    'DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}': (10, 10.0),
+    'PATCH /guilds/{guild_id}/members/{user_id}': (10, 10.0),
+}
+
+GLOBAL_LIMIT = (50, 1.0)
+
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc).isoformat()
+
+class Bucket:
+    """Fixed-window rate limit bucket on the simulated clock"""
+
+    def __init__(self, limit: int, per: float):
+        self.limit = limit
+        self.per = per
+        self.remaining = limit
+        self.reset_at = 0.0
+        self.lock = asyncio.Lock()
+
+class FakeDiscord:
+    """In-memory Discord backend for running the bot's commands offline.
+
+    It stands in for discord.py's HTTPClient.request, so the library's real
+    model and HTTP code runs unchanged: each route is answered from in-memory
+    guild data after a simulated latency and rate limit wait, and the matching
+    gateway event is fed back into the connection state, as Discord would.
+
+    Simulated time runs time_scale times slower than the wall clock reports
+    it, i.e. with time_scale=0.01 a 50ms request takes 0.5ms of real time.
+    """
+
+    def __init__(self, bot: discord.Client, latency: float = 0.05, time_scale: float = 0.01,
+                 limits: Optional[Dict[str, Tuple[int, float]]] = None):
+        self.bot = bot
+        self.state = bot._connection
+        self.latency = latency
+        self.time_scale = time_scale
+        self.limits = DEFAULT_LIMITS if limits is None else limits
+        self._buckets: Dict[Tuple[str, str], Bucket] = {}
+        self._global = Bucket(*GLOBAL_LIMIT)
+        self._started = time.monotonic()
+        self._next_id = 1 << 40
+        self._routes = {}
+        for method, path, handler in self._handlers():
+            pattern = re.escape(discord.http.Route.BASE + path)
+            pattern = re.sub(r'\\\{(\w+)\\\}', r'(?P<\1>[^/]+)', pattern)
+            self._routes[f'{method} {path}'] = (re.compile(pattern + '$'), handler)
+
+        # Every guild's data shares these tables, as IDs are unique across guilds
+        self.roles: Dict[int, dict] = {}
+        # (guild_id, user_id) -> member
+        self.members: Dict[Tuple[int, int], dict] = {}
+        self.channels: Dict[int, dict] = {}
+        self.messages: Dict[int, dict] = {}
+        self.bot_user = self._user_payload(self.snowflake(), 'TrialBot', bot=True)
+        self.state.user = discord.ClientUser(state=self.state, data=self.bot_user)
+        self.reset_counters()
+
+        bot.http.request = self.request
+
+    # Counters
+
+    def reset_counters(self):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.limited = 0
+        self.limited_seconds = 0.0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    # Simulated clock
+
+    def now(self) -> float:
+        return (time.monotonic() - self._started) / self.time_scale
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds * self.time_scale)
+
+    def snowflake(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    # Guild setup
+
+    def build_guild(self, member_count: int, name: str = 'Benchmark Guild', channel_count: int = 1) -> discord.Guild:
+        """Create a guild with text channels, an admin role and member_count members (plus the bot)"""
+        guild_id = self.snowflake()
+        everyone = self._role_payload(guild_id, '@everyone', position=0, permissions=discord.Permissions.general().value)
+        admin = self._role_payload(self.snowflake(), 'Admin', position=1, permissions=discord.Permissions(administrator=True).value)
+        roles = [everyone, admin]
+        self.roles.update((int(role['id']), role) for role in roles)
+
+        channels = []
+        for n in range(channel_count):
+            channel_id = self.snowflake()
+            self.channels[channel_id] = {
+                'id': str(channel_id), 'type': 0, 'guild_id': str(guild_id), 'name': f'courtroom-{n + 1}',
+                'position': n, 'permission_overwrites': [], 'topic': None, 'nsfw': False,
+                'parent_id': None, 'rate_limit_per_user': 0,
+            }
+            channels.append(self.channels[channel_id])
+
+        members = [self._member_payload(self.bot_user, [admin['id']])]
+        for n in range(member_count):
+            user = self._user_payload(self.snowflake(), f'member{n}')
+            # The first member is the administrator running the commands
+            members.append(self._member_payload(user, [admin['id']] if n == 0 else []))
+        for member in members:
+            self.members[(guild_id, int(member['user']['id']))] = member
+
+        return self.state._add_guild_from_data({
+            'id': str(guild_id), 'name': name, 'owner_id': self.bot_user['id'],
+            'roles': roles, 'channels': channels, 'members': members, 'member_count': len(members),
+            'features': [], 'emojis': [], 'stickers': [], 'large': member_count > 250,
+        })
+
+    def _user_payload(self, user_id: int, name: str, bot: bool = False) -> dict:
+        return {'id': str(user_id), 'username': name, 'discriminator': '0', 'global_name': None,
+                'avatar': None, 'bot': bot}
+
+    def _member_payload(self, user: dict, roles: List[str]) -> dict:
+        return {'user': user, 'roles': roles, 'joined_at': EPOCH, 'deaf': False, 'mute': False, 'flags': 0}
+
+    def _role_payload(self, role_id: int, name: str, position: int, permissions: int = 0, **fields) -> dict:
+        return {'id': str(role_id), 'name': name, 'position': position, 'permissions': str(permissions),
+                'color': fields.get('color', 0), 'hoist': fields.get('hoist', False), 'managed': False,
+                'mentionable': fields.get('mentionable', False), 'flags': 0}
+
+    # Request handling
+
+    async def request(self, route: discord.http.Route, *, files=None, form=None, **kwargs):
+        entry = self._routes.get(route.key)
+        if entry is None:
+            raise NotImplementedError(f'FakeDiscord does not implement {route.key}')
+        pattern, handler = entry
+        params = pattern.match(route.url).groupdict()
+
+        await self._wait_for(self._global)
+        limit = self.limits.get(route.key)
+        if limit:
+            bucket_key = (route.key, route.major_parameters)
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = Bucket(*limit)
+            await self._wait_for(bucket)
+
+        self.calls[route.key] += 1
+        await self.sleep(self.latency)
+        payload = kwargs.get('json')
+        if payload is None and form:
+            # Messages with attachments send their JSON as the payload_json form field
+            payload = discord.utils._from_json(form[0]['value'])
+        return handler(params, payload)
+
+    async def _wait_for(self, bucket: Bucket):
+        async with bucket.lock:
+            now = self.now()
+            if now >= bucket.reset_at:
+                bucket.remaining = bucket.limit
+                bucket.reset_at = now + bucket.per
+            if bucket.remaining <= 0:
+                wait = bucket.reset_at - now
+                self.limited += 1
+                self.limited_seconds += wait
+                await self.sleep(wait)
+                bucket.remaining = bucket.limit
+                bucket.reset_at = self.now() + bucket.per
+            bucket.remaining -= 1
+
+    def _handlers(self):
+        return [
+            ('POST', '/channels/{channel_id}/messages', self._send_message),
+            ('PATCH', '/channels/{channel_id}/messages/{message_id}', self._edit_message),
+            ('PUT', '/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me', self._no_content),
+            ('PATCH', '/channels/{channel_id}', self._edit_channel),
+            ('POST', '/guilds/{guild_id}/roles', self._create_role),
+            ('PATCH', '/guilds/{guild_id}/roles', self._move_roles),
+            ('DELETE', '/guilds/{guild_id}/roles/{role_id}', self._delete_role),
+            ('PUT', '/guilds/{guild_id}/members/{user_id}/roles/{role_id}', self._add_member_role),
+            ('DELETE', '/guilds/{guild_id}/members/{user_id}/roles/{role_id}', self._remove_member_role),
+            ('PATCH', '/guilds/{guild_id}/members/{user_id}', self._edit_member),
+        ]
+
+    def _no_content(self, params, payload):
+        return None
+
+    def _send_message(self, params, payload):
+        message_id = self.snowflake()
+        message = {
+            'id': str(message_id), 'channel_id': params['channel_id'],
+            'author': self.bot_user,
+            'content': payload.get('content') or '', 'embeds': payload.get('embeds') or [],
+            'timestamp': EPOCH, 'edited_timestamp': None, 'tts': False, 'mention_everyone': False,
+            'mentions': [], 'mention_roles': [], 'attachments': [], 'pinned': False, 'type': 0,
+        }
+        self.messages[message_id] = message
+        return message
+
+    def _edit_message(self, params, payload):
+        message = self.messages[int(params['message_id'])]
+        for key in ('content', 'embeds'):
+            if key in payload:
+                message[key] = payload[key] or ([] if key == 'embeds' else '')
+        message['edited_timestamp'] = EPOCH
+        return message
+
+    def _edit_channel(self, params, payload):
+        channel = self.channels[int(params['channel_id'])]
+        channel.update(payload)
+        self.state.parse_channel_update(dict(channel))
+        return channel
+
+    def _create_role(self, params, payload):
+        role = self._role_payload(self.snowflake(), payload.get('name', 'new role'), position=1,
+                                  permissions=int(payload.get('permissions', 0)),
+                                  color=payload.get('color', 0), hoist=payload.get('hoist', False),
+                                  mentionable=payload.get('mentionable', False))
+        self.roles[int(role['id'])] = role
+        self.state.parse_guild_role_create({'guild_id': params['guild_id'], 'role': role})
+        return role
+
+    def _move_roles(self, params, payload):
+        for change in payload:
+            role = self.roles.get(int(change['id']))
+            if role is not None:
+                role['position'] = change['position']
+                self.state.parse_guild_role_update({'guild_id': params['guild_id'], 'role': dict(role)})
+        return list(self.roles.values())
+
+    def _delete_role(self, params, payload):
+        role_id = int(params['role_id'])
+        self.roles.pop(role_id)
+        for (guild_id, _), member in self.members.items():
+            if guild_id == int(params['guild_id']) and params['role_id'] in member['roles']:
+                member['roles'].remove(params['role_id'])
+        self.state.parse_guild_role_delete({'guild_id': params['guild_id'], 'role_id': params['role_id']})
+        return None
+
+    def _member_update(self, guild_id: str, member: dict):
+        self.state.parse_guild_member_update({'guild_id': guild_id, **member})
+
+    def _add_member_role(self, params, payload):
+        member = self.members[(int(params['guild_id']), int(params['user_id']))]
+        if params['role_id'] not in member['roles']:
+            member['roles'].append(params['role_id'])
+            self._member_update(params['guild_id'], member)
+        return None
+
+    def _remove_member_role(self, params, payload):
+        member = self.members[(int(params['guild_id']), int(params['user_id']))]
+        if params['role_id'] in member['roles']:
+            member['roles'].remove(params['role_id'])
+            self._member_update(params['guild_id'], member)
+        return None
+
+    def _edit_member(self, params, payload):
+        member = self.members[(int(params['guild_id']), int(params['user_id']))]
+        if 'roles' in payload:
+            member['roles'] = [str(role_id) for role_id in payload['roles']]
+            self._member_update(params['guild_id'], member)
+        return member
+
+    # Gateway events
+
+    def reaction_payload(self, message_id: int, user_id: int, emoji: str, added: bool = True) -> discord.RawReactionActionEvent:
+        """Build the raw reaction event Discord would send for a member's reaction"""
+        channel_id = self.messages[message_id]['channel_id']
+        guild_id = self.channels[int(channel_id)]['guild_id']
+        data = {'user_id': str(user_id), 'channel_id': channel_id, 'message_id': str(message_id),
+                'guild_id': guild_id, 'burst': False, 'type': 0}
+        emoji = discord.PartialEmoji(name=emoji)
+        payload = discord.RawReactionActionEvent(data, emoji, 'REACTION_ADD' if added else 'REACTION_REMOVE')
+        if added:
+            payload.member = self.bot.get_guild(int(guild_id)).get_member(user_id)
+        return payload
@@ -0,0 +1,284 @@
+"""Replay a storm of reaction events into the bot's raw reaction handlers.
+
+Usage: python -m benchmarks.reaction_storm [--events 20000] [--rate 2000] [--guilds 10] [--channels 2]
+                                           [--members 1000] [--remove-ratio 0.2] [--noise 0.1]
+                                           [--replay events.jsonl] [--save events.jsonl] [--json stats.json]
+
+Events are either synthesized or replayed from a JSONL file. Each line is either
+{"at": seconds, "op": "add" | "remove", "message_id": ..., "user_id": ..., "emoji": ...}
+or a raw gateway dispatch such as {"t": "MESSAGE_REACTION_ADD", "d": {...}}. Recorded
+messages and users are mapped onto the simulated guilds, so only the shape of the
+stream (timing, spread across messages, adds vs removes) is replayed.
+
+Events are dispatched as one task each, as discord.py does, at the stream's pace.
+The report covers handler throughput, latency from an event's due time to its
+handler finishing, the backlog of unfinished events, role queue growth and the
+REST calls the storm caused.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List, Tuple
+from benchmarks.bench_trials import BenchContext, prepare, settle
+
+@dataclass
+class StormEvent:
+    # Seconds from the start of the storm
+    at: float
+    added: bool
+    message_id: int
+    user_id: int
+    emoji: str
+
+@dataclass
+class Target:
+    """A message the storm reacts to, with the reactions that make sense on it"""
+    message_id: int
+    guild_id: int
+    emojis: Tuple[str, ...]
+    member_ids: List[int]
+
+@dataclass
+class StormStats:
+    events: int = 0
+    adds: int = 0
+    removes: int = 0
+    errors: int = 0
+    target_rate: float = 0.0
+    dispatch_seconds: float = 0.0
+    handled_seconds: float = 0.0
+    drain_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    latency_p50: float = 0.0
+    latency_p90: float = 0.0
+    latency_p99: float = 0.0
+    latency_max: float = 0.0
+    max_backlog: int = 0
+    max_queue_depth: int = 0
+    max_loop_lag: float = 0.0
+    queue: Dict[str, int] = field(default_factory=dict)
+    rest_calls: Dict[str, int] = field(default_factory=dict)
+    # (seconds, backlog, role queue depth) every sample interval
+    samples: List[Tuple[float, int, int]] = field(default_factory=list)
+
+async def build_targets(main, fake, guilds: int, channels: int, members: int) -> Tuple[List[Target], List[Target]]:
+    """Set up a Scrum Debate and a vote in every channel. Returns (watched targets, unwatched noise targets)."""
+    targets = []
+    noise = []
+    for n in range(guilds):
+        guild = fake.build_guild(members, name=f'Storm Guild {n + 1}', channel_count=channels)
+        humans = [member for member in guild.members if not member.bot]
+        member_ids = [member.id for member in humans[1:]]
+        for channel in guild.text_channels:
+            ctx = BenchContext(main.bot, guild, channel, humans[0])
+            await main.bot.get_command('scrumdebate').callback(ctx)
+            await main.bot.get_command('refute').callback(ctx, humans[1], humans[2])
+            await main.bot.get_command('endrefute').callback(ctx)
+            targets.append(Target(main.scrum_debates[channel.id]['setup_message_id'], guild.id, ("🔵", "🔴"), member_ids))
+            targets.append(Target(main.active_votes[channel.id]['message_id'], guild.id, ("1️⃣", "2️⃣"), member_ids))
+            message = await channel.send("Nothing to see here")
+            noise.append(Target(message.id, guild.id, ("👍", "😂"), member_ids))
+    await settle()
+    return targets, noise
+
+def synthesize(targets: List[Target], noise: List[Target], count: int, rate: float,
+               remove_ratio: float, noise_ratio: float, seed: int = 0) -> List[StormEvent]:
+    """Random adds and removes spread over the targets, at a steady rate"""
+    rng = random.Random(seed)
+    events = []
+    # Reactions currently on, so removals undo a real earlier add
+    present: List[Tuple[int, int, str]] = []
+    for i in range(count):
+        at = i / rate
+        if present and rng.random() < remove_ratio:
+            index = rng.randrange(len(present))
+            present[index], present[-1] = present[-1], present[index]
+            message_id, user_id, emoji = present.pop()
+            events.append(StormEvent(at, False, message_id, user_id, emoji))
+            continue
+        target = rng.choice(noise if noise and rng.random() < noise_ratio else targets)
+        user_id = rng.choice(target.member_ids)
+        emoji = rng.choice(target.emojis)
+        present.append((target.message_id, user_id, emoji))
+        events.append(StormEvent(at, True, target.message_id, user_id, emoji))
+    return events
+
+def load_events(path: str, targets: List[Target], rate: float, speed: float) -> List[StormEvent]:
+    """Read a recorded stream and map its messages and users onto the targets"""
+    messages: Dict[int, Target] = {}
+    users: Dict[Tuple[int, int], int] = {}
+    events = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 't' in record and 'd' in record:
+                if record['t'] not in ('MESSAGE_REACTION_ADD', 'MESSAGE_REACTION_REMOVE'):
+                    continue
+                data = record['d']
+                added = record['t'] == 'MESSAGE_REACTION_ADD'
+                emoji = data['emoji']['name']
+                at = record.get('at')
+            else:
+                data = record
+                added = record['op'] == 'add'
+                emoji = record['emoji']
+                at = record.get('at')
+
+            recorded_message = int(data['message_id'])
+            target = messages.get(recorded_message)
+            if target is None:
+                target = messages[recorded_message] = targets[len(messages) % len(targets)]
+            user_key = (target.message_id, int(data['user_id']))
+            if user_key not in users:
+                users[user_key] = target.member_ids[len(users) % len(target.member_ids)]
+            at = len(events) / rate if at is None else at / speed
+            events.append(StormEvent(at, added, target.message_id, users[user_key], emoji))
+    events.sort(key=lambda event: event.at)
+    return events
+
+def save_events(path: str, events: List[StormEvent]):
+    with open(path, 'w') as f:
+        for event in events:
+            f.write(json.dumps({'at': round(event.at, 6), 'op': 'add' if event.added else 'remove',
+                                'message_id': event.message_id, 'user_id': event.user_id,
+                                'emoji': event.emoji}, ensure_ascii=False) + '\n')
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+async def run_storm(main, fake, events: List[StormEvent], sample_interval: float = 0.1) -> StormStats:
+    from role_queue import role_update_queue
+
+    stats = StormStats(events=len(events))
+    stats.adds = sum(event.added for event in events)
+    stats.removes = stats.events - stats.adds
+    if events and events[-1].at > 0:
+        stats.target_rate = len(events) / events[-1].at
+    latencies: List[float] = []
+    in_flight = 0
+    start = time.perf_counter()
+
+    async def handle(event: StormEvent, due: float):
+        nonlocal in_flight
+        payload = fake.reaction_payload(event.message_id, event.user_id, event.emoji, added=event.added)
+        try:
+            if event.added:
+                await main.on_raw_reaction_add(payload)
+            else:
+                await main.on_raw_reaction_remove(payload)
+        except Exception:
+            stats.errors += 1
+        finally:
+            in_flight -= 1
+            latencies.append(time.perf_counter() - due)
+
+    async def sample():
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(sample_interval)
+            stats.max_loop_lag = max(stats.max_loop_lag, time.perf_counter() - before - sample_interval)
+            depth = role_update_queue.depth
+            stats.samples.append((round(time.perf_counter() - start, 3), in_flight, depth))
+            stats.max_backlog = max(stats.max_backlog, in_flight)
+            stats.max_queue_depth = max(stats.max_queue_depth, depth)
+
+    queue_before = role_update_queue.stats()
+    fake.reset_counters()
+    sampler = asyncio.create_task(sample())
+    cpu_start = time.process_time()
+    tasks = []
+    i = 0
+    while i < len(events):
+        now = time.perf_counter() - start
+        # Dispatch everything that is due, then sleep until the next event
+        while i < len(events) and events[i].at <= now:
+            in_flight += 1
+            stats.max_backlog = max(stats.max_backlog, in_flight)
+            tasks.append(asyncio.create_task(handle(events[i], start + events[i].at)))
+            i += 1
+        if i < len(events):
+            await asyncio.sleep(max(0.0, events[i].at - (time.perf_counter() - start)))
+    stats.dispatch_seconds = time.perf_counter() - start
+
+    await asyncio.gather(*tasks)
+    stats.handled_seconds = time.perf_counter() - start
+    stats.cpu_seconds = time.process_time() - cpu_start
+
+    # Role changes keep draining after the last handler returns
+    sampler.cancel()
+    await settle()
+    stats.drain_seconds = time.perf_counter() - start
+    stats.queue = {key: value - queue_before.get(key, 0) for key, value in role_update_queue.stats().items()
+                   if key != 'depth'}
+    stats.rest_calls = dict(fake.calls)
+
+    ordered = sorted(latencies)
+    stats.latency_p50 = percentile(ordered, 0.5)
+    stats.latency_p90 = percentile(ordered, 0.9)
+    stats.latency_p99 = percentile(ordered, 0.99)
+    stats.latency_max = ordered[-1] if ordered else 0.0
+    return stats
+
+def report(stats: StormStats, time_scale: float):
+    handled_rate = stats.events / stats.handled_seconds if stats.handled_seconds else 0.0
+    print(f"Events: {stats.events} ({stats.adds} adds, {stats.removes} removes, {stats.errors} errors)")
+    print(f"Rate: {stats.target_rate:.0f}/s target, {handled_rate:.0f}/s handled, "
+          f"{stats.cpu_seconds * 1000 / max(stats.events, 1):.3f}ms CPU per event")
+    print(f"Latency: p50 {stats.latency_p50 * 1000:.2f}ms, p90 {stats.latency_p90 * 1000:.2f}ms, "
+          f"p99 {stats.latency_p99 * 1000:.2f}ms, max {stats.latency_max * 1000:.2f}ms")
+    print(f"Backlog: {stats.max_backlog} events in flight at most, event loop lag up to {stats.max_loop_lag * 1000:.1f}ms")
+    print(f"Role queue: up to {stats.max_queue_depth} members pending, {stats.queue.get('merged', 0)} merged, "
+          f"{stats.queue.get('dropped', 0)} dropped, {stats.queue.get('sent', 0)} sent, "
+          f"{stats.queue.get('failed', 0)} failed")
+    drain = stats.drain_seconds - stats.handled_seconds
+    print(f"Drain: {drain:.2f}s after the last handler (about {drain / time_scale:.0f}s live), "
+          f"{sum(stats.rest_calls.values())} REST calls")
+    for route, calls in sorted(stats.rest_calls.items(), key=lambda item: -item[1]):
+        print(f"  {calls:>7}  {route}")
+
+async def main_async(args) -> StormStats:
+    main, fake = await prepare(args.latency, args.time_scale)
+    targets, noise = await build_targets(main, fake, args.guilds, args.channels, args.members)
+    if args.replay:
+        events = load_events(args.replay, targets, args.rate, args.speed)
+    else:
+        events = synthesize(targets, noise, args.events, args.rate, args.remove_ratio, args.noise, args.seed)
+    if args.save:
+        save_events(args.save, events)
+
+    print(f"Replaying {len(events)} events over {len(targets)} watched messages in {args.guilds} guilds...")
+    stats = await run_storm(main, fake, events)
+    report(stats, args.time_scale)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=20000, help='events to synthesize')
+    parser.add_argument('--rate', type=float, default=2000, help='events per second')
+    parser.add_argument('--guilds', type=int, default=10)
+    parser.add_argument('--channels', type=int, default=2, help='trial channels per guild')
+    parser.add_argument('--members', type=int, default=1000, help='members per guild')
+    parser.add_argument('--remove-ratio', type=float, default=0.2, help='share of events that remove a reaction')
+    parser.add_argument('--noise', type=float, default=0.1, help='share of adds on messages the bot ignores')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--replay', help='JSONL file of recorded events to replay instead')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay recorded timestamps this many times faster')
+    parser.add_argument('--save', help='write the event stream to this JSONL file')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated REST latency in seconds')
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                        help='real seconds per simulated second for latency and rate limit waits')
+    parser.add_argument('--json', help='also write the statistics to this file')
+    args = parser.parse_args()
+
+    stats = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(asdict(stats), f, indent=2)
+
+if __name__ == '__main__':
+    main()
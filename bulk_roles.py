@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+import discord
+
+# Above this many holders it is cheaper to delete and recreate the role than to
+# remove it from each member
+RECREATE_THRESHOLD = 25
+
+# Removals in flight at once when clearing member by member
+REMOVE_CONCURRENCY = 5
+
+# Minimum seconds between progress edits of the status message
+PROGRESS_INTERVAL = 2.0
+
+async def _report(status_msg: Optional[discord.Message], content: str):
+    if status_msg is None:
+        return
+    try:
+        await status_msg.edit(content=content)
+    except discord.HTTPException:
+        pass
+
+async def recreate_role(role: discord.Role, reason: str) -> discord.Role:
+    """Replace a role with an identical empty copy, in a constant number of requests"""
+    position = role.position
+    new_role = await role.guild.create_role(
+        name=role.name,
+        permissions=role.permissions,
+        color=role.color,
+        hoist=role.hoist,
+        mentionable=role.mentionable,
+        reason=reason
+    )
+    await role.delete(reason=reason)
+    try:
+        # Keep the copy where the original sat in the role list
+        await new_role.edit(position=position, reason=reason)
+    except discord.HTTPException:
+        pass
+    return new_role
+
+async def remove_from_members(role: discord.Role, members: List[discord.Member],
+                              status_msg: Optional[discord.Message] = None) -> List[discord.Member]:
+    """Remove a role from members with bounded concurrency. Returns the members it couldn't be removed from."""
+    semaphore = asyncio.Semaphore(REMOVE_CONCURRENCY)
+    done = 0
+    failed = []
+    last_report = time.monotonic()
+
+    async def remove(member):
+        nonlocal done, last_report
+        async with semaphore:
+            try:
+                await member.remove_roles(role)
+            except discord.HTTPException:
+                failed.append(member)
+        done += 1
+        if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            await _report(status_msg, f"🔄 Removing {role.name}: {done}/{len(members)}")
+
+    await asyncio.gather(*(remove(member) for member in members))
+    return failed
+
+async def clear_role(role: discord.Role, members: List[discord.Member],
+                     status_msg: Optional[discord.Message] = None,
+                     reason: str = "Clearing trial role") -> Tuple[discord.Role, List[discord.Member]]:
+    """Take a role away from all of its holders, choosing the cheaper strategy.
+
+    Returns the role that holds the name afterwards (the same role, or its
+    replacement with a new ID when it was recreated) and the members that
+    still hold it because their removal failed.
+    """
+    if len(members) > RECREATE_THRESHOLD:
+        await _report(status_msg, f"🔄 Resetting {role.name} for {len(members)} members...")
+        return await recreate_role(role, reason), []
+
+    failed = []
+    if members:
+        failed = await remove_from_members(role, members, status_msg)
+        if failed:
+            await _report(status_msg, f"⚠️ Could not remove {role.name} from {len(failed)} members")
+    return role, failed
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+import aiohttp
+from bullet_io import ensure_dir
+
+try:
+    from PIL import Image
+except ImportError:
+    # Thumbnails are optional; without Pillow the original image is attached
+    Image = None
+
+# Discord's attachment limit for bots without boosts
+MAX_IMAGE_BYTES = 25 * 1024 * 1024
+
+IMAGE_FILE_PATTERN = re.compile(r'([0-9a-f]{64})(\.thumb)?\.(png|jpg|gif|webp)$')
+
+# Downloads an image URL and returns its bytes
+Downloader = Callable[[str], Awaitable[bytes]]
+
+def sniff_extension(data: bytes) -> Optional[str]:
+    """File extension of a PNG, JPEG, GIF or WebP image, or None if it's none of those"""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+class AiohttpDownloader:
+    """Fetch images over HTTP with aiohttp (a discord.py dependency), refusing oversized ones"""
+
+    def __init__(self, max_bytes: int = MAX_IMAGE_BYTES, timeout: float = 30.0):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+    async def __call__(self, url: str) -> bytes:
+        # Images are only downloaded when bullets are added or imported, so a session per download is fine
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                if response.content_length and response.content_length > self.max_bytes:
+                    raise ValueError(f'image is larger than {self.max_bytes} bytes')
+                data = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    data += chunk
+                    if len(data) > self.max_bytes:
+                        raise ValueError(f'image is larger than {self.max_bytes} bytes')
+                return bytes(data)
+
+@dataclass
+class CachedImage:
+    path: str
+    size: int
+    # Downscaled copy attached instead of the original, when thumbnails are enabled
+    thumbnail: Optional[str] = None
+    thumbnail_size: int = 0
+
+    @property
+    def attachment_path(self) -> str:
+        return self.thumbnail or self.path
+
+    @property
+    def filename(self) -> str:
+        """Name to attach the image under, which embeds refer to as attachment://<filename>"""
+        return os.path.basename(self.attachment_path)
+
+class ImageStore:
+    """Truth bullet images downloaded once and kept under data/images, named by their SHA-256.
+
+    Identical images are stored once however many bullets use them, and the
+    least recently shown images are deleted once the directory grows past
+    max_bytes. Recency is tracked in memory; after a restart it falls back to
+    the time each image was last stored.
+    """
+
+    def __init__(self, directory: str = 'data/images', max_bytes: int = 512 * 1024 * 1024,
+                 downloader: Optional[Downloader] = None, thumbnail_size: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.downloader = downloader or AiohttpDownloader()
+        self.thumbnail_size = thumbnail_size
+        self.total_bytes = 0
+        # hash -> image, least recently used first
+        self._images: OrderedDict[str, CachedImage] = OrderedDict()
+
+    def __len__(self):
+        return len(self._images)
+
+    def configure(self, directory: str, max_bytes: int, thumbnail_size: int = 0,
+                  downloader: Optional[Downloader] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        if downloader is not None:
+            self.downloader = downloader
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def scan(self):
+        """Index the images already on disk, oldest first. Blocking; run it in a worker thread."""
+        self._images.clear()
+        self.total_bytes = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        images: Dict[str, CachedImage] = {}
+        thumbnails = {}
+        mtimes = {}
+        for entry in entries:
+            match = IMAGE_FILE_PATTERN.match(entry.name)
+            if not match:
+                continue
+            stat = entry.stat()
+            if match.group(2):
+                thumbnails[match.group(1)] = (entry.path, stat.st_size)
+            else:
+                images[match.group(1)] = CachedImage(entry.path, stat.st_size)
+                mtimes[match.group(1)] = stat.st_mtime
+        for image_hash in sorted(images, key=mtimes.get):
+            image = images[image_hash]
+            if image_hash in thumbnails:
+                image.thumbnail, image.thumbnail_size = thumbnails[image_hash]
+            self._add(image_hash, image)
+
+    def peek(self, image_hash: str) -> Optional[CachedImage]:
+        return self._images.get(image_hash)
+
+    def lookup(self, image_hash: str) -> Optional[CachedImage]:
+        """The cached image with this hash, marking it recently used, or None if it was evicted"""
+        image = self._images.get(image_hash)
+        if image is not None:
+            self._images.move_to_end(image_hash)
+        return image
+
+    async def store(self, url: str) -> Optional[str]:
+        """Download an image into the cache and return its hash, or None if that failed"""
+        if not self.enabled:
+            return None
+        try:
+            data = await self.downloader(url)
+        except Exception as e:
+            print(f'Failed to download bullet image {url}: {e}')
+            return None
+        extension = sniff_extension(data)
+        if extension is None:
+            print(f'Not caching bullet image {url}: not a PNG, JPEG, GIF or WebP image')
+            return None
+
+        image_hash = hashlib.sha256(data).hexdigest()
+        if self.lookup(image_hash) is None:
+            try:
+                image = await asyncio.to_thread(self._write, image_hash, extension, data)
+            except OSError as e:
+                print(f'Failed to cache bullet image {url}: {e}')
+                return None
+            # Another command may have stored the same image meanwhile
+            if image_hash not in self._images:
+                self._add(image_hash, image)
+            self._evict(keep=image_hash)
+        return image_hash
+
+    async def store_many(self, urls: Iterable[str], concurrency: int = 4) -> Dict[str, Optional[str]]:
+        """Cache several images, a few downloads at a time. Returns {url: hash or None}."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def store(url):
+            async with semaphore:
+                return url, await self.store(url)
+
+        return dict(await asyncio.gather(*(store(url) for url in set(urls))))
+
+    def _write(self, image_hash: str, extension: str, data: bytes) -> CachedImage:
+        ensure_dir(self.directory)
+        path = os.path.join(self.directory, f'{image_hash}.{extension}')
+        if not os.path.exists(path):
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        image = CachedImage(path, len(data))
+        if self.thumbnail_size and Image is not None and extension != 'gif':
+            # Animated GIFs would lose their animation, so they are always attached whole
+            thumbnail = os.path.join(self.directory, f'{image_hash}.thumb.png')
+            try:
+                with Image.open(io.BytesIO(data)) as original:
+                    original.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                    original.save(thumbnail, 'PNG')
+            except Exception as e:
+                print(f'Failed to create a thumbnail of image {image_hash}: {e}')
+            else:
+                image.thumbnail = thumbnail
+                image.thumbnail_size = os.path.getsize(thumbnail)
+        return image
+
+    def _add(self, image_hash: str, image: CachedImage):
+        self._images[image_hash] = image
+        self.total_bytes += image.size + image.thumbnail_size
+
+    def _evict(self, keep: str):
+        while self.total_bytes > self.max_bytes and len(self._images) > 1:
+            image_hash, image = next(iter(self._images.items()))
+            if image_hash == keep:
+                break
+            del self._images[image_hash]
+            self.total_bytes -= image.size + image.thumbnail_size
+            # Bullets using an evicted image fall back to its original URL
+            for path in (image.path, image.thumbnail):
+                if path:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+# Shared image cache used by every truth bullet
+image_store = ImageStore()
@@ -0,0 +1,121 @@
+import asyncio
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Protocol
+
+class BufferedWriter(Protocol):
+    guild_id: int
+
+    def take_write(self) -> Optional[Callable[[], None]]:
+        """Capture the pending changes and return a job that writes them, or None if there are none"""
+
+    def write_failed(self):
+        """Make the next write a full snapshot, as the last one may not have reached the disk"""
+
+_data_dirs = set()
+
+def ensure_dir(directory: str):
+    """Create a data directory once per process rather than before every write"""
+    if directory not in _data_dirs:
+        os.makedirs(directory, exist_ok=True)
+        _data_dirs.add(directory)
+
+class BulletWriter:
+    """Write-behind persistence for truth bullet managers on a dedicated I/O thread.
+
+    Marking a manager dirty schedules one flush a moment later, however many
+    bullets change in between. The flush captures each dirty manager's changes
+    on the event loop and hands the file work to a single worker thread, so
+    writes never block the loop and always land in the order they were made.
+    """
+
+    def __init__(self, flush_delay: float = 1.0):
+        self.flush_delay = flush_delay
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bullet-io')
+        self._dirty: Dict[int, BufferedWriter] = {}
+        # guild_id -> the guild's most recently submitted write
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty) + sum(not future.done() for future in self._inflight.values())
+
+    def mark_dirty(self, writer: BufferedWriter):
+        self._dirty[writer.guild_id] = writer
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. scripts and tests): write straight away
+            self._write_now(writer)
+            return
+        self._flush_handle = loop.call_later(self.flush_delay, self.flush)
+
+    def flush(self):
+        """Submit the pending writes of every dirty manager"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for writer in list(self._dirty.values()):
+            self.submit(writer)
+
+    def submit(self, writer: BufferedWriter) -> Optional[asyncio.Future]:
+        """Submit one manager's pending writes now, e.g. before it is evicted"""
+        self._dirty.pop(writer.guild_id, None)
+        job = writer.take_write()
+        if job is None:
+            return self._inflight.get(writer.guild_id)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, job)
+        self._inflight[writer.guild_id] = future
+        future.add_done_callback(lambda done: self._written(writer, done))
+        return future
+
+    def _written(self, writer: BufferedWriter, future: asyncio.Future):
+        if self._inflight.get(writer.guild_id) is future:
+            del self._inflight[writer.guild_id]
+        if not future.cancelled() and future.exception() is not None:
+            print(f'Failed to save truth bullets for guild {writer.guild_id}: {future.exception()}')
+            # The manager rewrites its full snapshot on the next flush
+            writer.write_failed()
+            self.mark_dirty(writer)
+
+    def _write_now(self, writer: BufferedWriter):
+        self._dirty.pop(writer.guild_id, None)
+        job = writer.take_write()
+        if job is not None:
+            self._executor.submit(job).result()
+
+    def submit_job(self, job: Callable[[], None]) -> Future:
+        """Run another file write on the I/O thread, in order with the bullet writes"""
+        return self._executor.submit(job)
+
+    async def wait_for(self, guild_id: int):
+        """Wait until everything written for a guild so far is on disk"""
+        writer = self._dirty.get(guild_id)
+        future = self.submit(writer) if writer is not None else self._inflight.get(guild_id)
+        if future is not None:
+            await asyncio.shield(future)
+
+    async def drain(self):
+        """Flush every dirty manager and wait for all writes to finish"""
+        self.flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+
+    def close(self):
+        """Shutdown barrier: write whatever is still pending and stop the I/O thread"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for writer in list(self._dirty.values()):
+            self._dirty.pop(writer.guild_id, None)
+            job = writer.take_write()
+            if job is not None:
+                self._executor.submit(job)
+        # Waits for the queued jobs, including any submitted from the event loop
+        self._executor.shutdown(wait=True)
+
+# Shared writer used by every truth bullet manager
+bullet_writer = BulletWriter()
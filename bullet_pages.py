@@ -0,0 +1,87 @@
+from typing import List, Optional
+import discord
+
+# Discord rejects embeds with more than 25 fields or 6000 characters in total
+MAX_FIELDS = 25
+MAX_EMBED_CHARS = 6000
+
+# Bullets shown per page, kept well under the field limit for readability
+BULLETS_PER_PAGE = 10
+
+PAGE_TITLE = "Truth Bullets"
+
+# Room left for the title and the "Page x/y" footer
+PAGE_CHAR_BUDGET = MAX_EMBED_CHARS - len(PAGE_TITLE) - 50
+
+def _field(bullet):
+    name = f"#{bullet.id}: {bullet.name}"[:256]
+    value = bullet.description[:100] + "..." if len(bullet.description) > 100 else bullet.description
+    return name, value
+
+def render_pages(bullets) -> List[discord.Embed]:
+    """Split the bullets into embeds that stay within Discord's limits"""
+    pages = []
+    fields = []
+    chars = 0
+    for bullet in bullets:
+        name, value = _field(bullet)
+        size = len(name) + len(value)
+        if fields and (len(fields) >= min(BULLETS_PER_PAGE, MAX_FIELDS) or chars + size > PAGE_CHAR_BUDGET):
+            pages.append(fields)
+            fields = []
+            chars = 0
+        fields.append((name, value))
+        chars += size
+    if fields:
+        pages.append(fields)
+
+    embeds = []
+    for number, page_fields in enumerate(pages, start=1):
+        embed = discord.Embed(title=PAGE_TITLE, color=discord.Color.gold())
+        for name, value in page_fields:
+            embed.add_field(name=name, value=value, inline=False)
+        embed.set_footer(text=f"Page {number}/{len(pages)}")
+        embeds.append(embed)
+    return embeds
+
+class BulletPageView(discord.ui.View):
+    """Previous/next buttons for a !bullets listing.
+
+    Pages come from the manager's page cache on every click, so a listing left
+    open keeps up with bullets added or removed since it was posted.
+    """
+
+    def __init__(self, manager, page: int, timeout: float = 180):
+        super().__init__(timeout=timeout)
+        self.manager = manager
+        self.page = page
+        self.message: Optional[discord.Message] = None
+        self._update_buttons(len(manager.get_pages()))
+
+    def _update_buttons(self, page_count: int):
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= page_count - 1
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        pages = self.manager.get_pages()
+        if not pages:
+            await interaction.response.edit_message(content="❌ No truth bullets exist yet!", embed=None, view=None)
+            return
+        self.page = max(0, min(page, len(pages) - 1))
+        self._update_buttons(len(pages))
+        await interaction.response.edit_message(embed=pages[self.page], view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+    async def on_timeout(self):
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
@@ -0,0 +1,89 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# A term in a bullet's name counts this many times more than one in its description
+NAME_WEIGHT = 3
+
+# Characters of context shown either side of a hit in a snippet
+SNIPPET_CONTEXT = 40
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.casefold())
+
+def make_snippet(text: str, terms: Iterable[str]) -> Optional[str]:
+    """Return the text around the first occurrence of any term, with the hit in bold"""
+    terms = set(terms)
+    for match in TOKEN_PATTERN.finditer(text):
+        if match.group().casefold() in terms:
+            start = max(0, match.start() - SNIPPET_CONTEXT)
+            end = min(len(text), match.end() + SNIPPET_CONTEXT)
+            prefix = "..." if start > 0 else ""
+            suffix = "..." if end < len(text) else ""
+            return f"{prefix}{text[start:match.start()]}**{match.group()}**{text[match.end():end]}{suffix}"
+    return None
+
+class SearchHit(NamedTuple):
+    bullet_id: int
+    score: float
+    matched_terms: int
+
+class BulletSearchIndex:
+    """Inverted index over truth bullet names and descriptions.
+
+    Queries only visit the postings of their own terms, never the full bullet set.
+    """
+
+    def __init__(self):
+        # term -> bullet id -> weighted term frequency
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # bullet id -> terms it was indexed under, so it can be removed again
+        self._terms: Dict[int, List[str]] = {}
+
+    def __len__(self):
+        return len(self._terms)
+
+    def add(self, bullet):
+        counts = Counter(tokenize(bullet.description))
+        for term in tokenize(bullet.name):
+            counts[term] += NAME_WEIGHT
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[bullet.id] = count
+        self._terms[bullet.id] = list(counts)
+
+    def remove(self, bullet_id: int):
+        for term in self._terms.pop(bullet_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(bullet_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def rebuild(self, bullets):
+        self._postings = {}
+        self._terms = {}
+        for bullet in bullets:
+            self.add(bullet)
+
+    def search(self, query: str, limit: int = 10) -> List[SearchHit]:
+        """Rank bullets by how many query terms they contain, then by TF-IDF score"""
+        terms = set(tokenize(query))
+        scores: Dict[int, float] = {}
+        matched: Counter = Counter()
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + len(self._terms) / len(postings))
+            for bullet_id, frequency in postings.items():
+                scores[bullet_id] = scores.get(bullet_id, 0.0) + frequency * idf
+                matched[bullet_id] += 1
+
+        ranked = heapq.nsmallest(limit, scores, key=lambda bullet_id: (-matched[bullet_id], -scores[bullet_id], bullet_id))
+        return [SearchHit(bullet_id, scores[bullet_id], matched[bullet_id]) for bullet_id in ranked]
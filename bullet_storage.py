@@ -0,0 +1,243 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from bullet_io import ensure_dir
+
+# Bullets are stored as their to_dict() records: {'id', 'name', 'description', 'image_url', 'image_hash'}
+BulletRecords = Dict[int, dict]
+
+STORAGE_FILE_PATTERN = re.compile(r'truth_bullets_(\d+)\.(?:json|journal)$')
+
+class JsonBulletStore:
+    """One JSON snapshot plus an append-only journal per guild, under data/.
+
+    Journals are compacted into the snapshot by the manager, so load() also
+    reports how many journal entries it replayed.
+    """
+
+    compacts = True
+
+    def __init__(self, directory: str = 'data'):
+        self.directory = directory
+
+    def _snapshot_path(self, guild_id: int) -> str:
+        return f'{self.directory}/truth_bullets_{guild_id}.json'
+
+    def _journal_path(self, guild_id: int) -> str:
+        return f'{self.directory}/truth_bullets_{guild_id}.journal'
+
+    def load(self, guild_id: int) -> Tuple[BulletRecords, int, int]:
+        """Return (records by ID, next ID, journal entries replayed)"""
+        try:
+            with open(self._snapshot_path(guild_id), 'r') as f:
+                data = json.load(f)
+                records = {int(k): v for k, v in data['bullets'].items()}
+                next_id = data['next_id']
+        except FileNotFoundError:
+            records = {}
+            next_id = 1
+
+        entries = 0
+        try:
+            with open(self._journal_path(guild_id), 'r') as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        if f.read().strip():
+                            # Valid entries follow, so this isn't a torn append; compacting would lose them
+                            raise ValueError(
+                                f'Line {number} of {self._journal_path(guild_id)} is corrupt; '
+                                f'fix or remove it to load the truth bullets of guild {guild_id}'
+                            ) from None
+                        # A crash mid-append leaves a partial last line; everything before it is valid.
+                        # Compact straight away so new entries aren't appended after the broken line.
+                        self.write_snapshot(guild_id, records, next_id)
+                        return records, next_id, 0
+                    next_id = apply_entry(records, next_id, entry)
+                    entries += 1
+        except FileNotFoundError:
+            pass
+        return records, next_id, entries
+
+    def append(self, guild_id: int, entries: List[dict], next_id: int):
+        ensure_dir(self.directory)
+        with open(self._journal_path(guild_id), 'a') as f:
+            f.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries))
+
+    def write_snapshot(self, guild_id: int, records: BulletRecords, next_id: int):
+        """Write a full snapshot atomically and reset the journal"""
+        ensure_dir(self.directory)
+        path = self._snapshot_path(guild_id)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'bullets': {str(k): v for k, v in records.items()},
+                'next_id': next_id
+            }, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        open(self._journal_path(guild_id), 'w').close()
+
+    def stored_guild_ids(self) -> set[int]:
+        """Guild IDs that have bullet files on disk"""
+        try:
+            entries = os.scandir(self.directory)
+        except FileNotFoundError:
+            return set()
+        with entries:
+            return {
+                int(match.group(1))
+                for entry in entries
+                if (match := STORAGE_FILE_PATTERN.match(entry.name))
+            }
+
+    def close(self):
+        pass
+
+def apply_entry(records: BulletRecords, next_id: int, entry: dict) -> int:
+    """Apply one journal entry to records and return the new next ID"""
+    # Entries are idempotent, so replaying a journal already folded into the snapshot is harmless
+    if entry['op'] == 'add':
+        record = entry['bullet']
+        records[record['id']] = record
+        return max(next_id, record['id'] + 1)
+    if entry['op'] == 'remove':
+        records.pop(entry['id'], None)
+    return next_id
+
+# Statements are constant strings so sqlite3's per-connection cache prepares each one once
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS bullets ('
+    ' guild_id INTEGER NOT NULL, id INTEGER NOT NULL, name TEXT NOT NULL,'
+    ' description TEXT NOT NULL, image_url TEXT, image_hash TEXT, PRIMARY KEY (guild_id, id)) WITHOUT ROWID',
+    # Name lookups are answered by each manager's in-memory index, so an SQL name index only slowed writes
+    'DROP INDEX IF EXISTS bullets_by_name',
+    'CREATE TABLE IF NOT EXISTS guilds (guild_id INTEGER PRIMARY KEY, next_id INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+)
+SELECT_BULLETS = 'SELECT id, name, description, image_url, image_hash FROM bullets WHERE guild_id = ? ORDER BY id'
+SELECT_NEXT_ID = 'SELECT next_id FROM guilds WHERE guild_id = ?'
+SELECT_GUILDS = 'SELECT guild_id FROM guilds'
+UPSERT_BULLET = ('INSERT OR REPLACE INTO bullets (guild_id, id, name, description, image_url, image_hash)'
+                 ' VALUES (?, ?, ?, ?, ?, ?)')
+DELETE_BULLET = 'DELETE FROM bullets WHERE guild_id = ? AND id = ?'
+DELETE_GUILD_BULLETS = 'DELETE FROM bullets WHERE guild_id = ?'
+UPSERT_NEXT_ID = 'INSERT OR REPLACE INTO guilds (guild_id, next_id) VALUES (?, ?)'
+SELECT_META = 'SELECT value FROM meta WHERE key = ?'
+UPSERT_META = 'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)'
+# Databases created before bullets had cached images
+SELECT_COLUMNS = 'SELECT name FROM pragma_table_info(\'bullets\')'
+ADD_IMAGE_HASH = 'ALTER TABLE bullets ADD COLUMN image_hash TEXT'
+
+def _row(guild_id: int, record: dict) -> tuple:
+    return (guild_id, record['id'], record['name'], record['description'], record.get('image_url'),
+            record.get('image_hash'))
+
+def _record(row: tuple) -> dict:
+    return {'id': row[0], 'name': row[1], 'description': row[2], 'image_url': row[3], 'image_hash': row[4]}
+
+class SqliteBulletStore:
+    """Every guild's truth bullets in one SQLite database in WAL mode.
+
+    Each thread gets its own connection: loads run in worker threads while the
+    bullet writer's I/O thread writes, which WAL allows without blocking. Rows
+    are updated in place, so there is no journal to compact.
+    """
+
+    compacts = False
+
+    def __init__(self, path: str = 'data/truth_bullets.db', json_directory: Optional[str] = 'data'):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        ensure_dir(os.path.dirname(path) or '.')
+        db = self._db()
+        with db:
+            for statement in SCHEMA:
+                db.execute(statement)
+            if 'image_hash' not in {row[0] for row in db.execute(SELECT_COLUMNS)}:
+                db.execute(ADD_IMAGE_HASH)
+        if json_directory is not None:
+            self.migrate_json(json_directory)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+            db.execute('PRAGMA journal_mode=WAL')
+            # WAL keeps the database consistent with NORMAL; only the last commits can be lost on power failure
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            with self._connections_lock:
+                self._connections.append(db)
+        return db
+
+    def load(self, guild_id: int) -> Tuple[BulletRecords, int, int]:
+        db = self._db()
+        records = {row[0]: _record(row) for row in db.execute(SELECT_BULLETS, (guild_id,))}
+        row = db.execute(SELECT_NEXT_ID, (guild_id,)).fetchone()
+        next_id = row[0] if row else max(records, default=0) + 1
+        return records, next_id, 0
+
+    def append(self, guild_id: int, entries: List[dict], next_id: int):
+        db = self._db()
+        with db:
+            for entry in entries:
+                if entry['op'] == 'add':
+                    db.execute(UPSERT_BULLET, _row(guild_id, entry['bullet']))
+                elif entry['op'] == 'remove':
+                    db.execute(DELETE_BULLET, (guild_id, entry['id']))
+            db.execute(UPSERT_NEXT_ID, (guild_id, next_id))
+
+    def write_snapshot(self, guild_id: int, records: BulletRecords, next_id: int):
+        db = self._db()
+        with db:
+            self._replace_guild(db, guild_id, records.values(), next_id)
+
+    def _replace_guild(self, db: sqlite3.Connection, guild_id: int, records: Iterable[dict], next_id: int):
+        db.execute(DELETE_GUILD_BULLETS, (guild_id,))
+        db.executemany(UPSERT_BULLET, (_row(guild_id, record) for record in records))
+        db.execute(UPSERT_NEXT_ID, (guild_id, next_id))
+
+    def stored_guild_ids(self) -> set[int]:
+        return {row[0] for row in self._db().execute(SELECT_GUILDS)}
+
+    def migrate_json(self, directory: str = 'data') -> int:
+        """Import the per-guild JSON files once, in a single transaction. Returns the guilds imported."""
+        db = self._db()
+        if db.execute(SELECT_META, ('json_migrated',)).fetchone():
+            return 0
+        json_store = JsonBulletStore(directory)
+        guild_ids = sorted(json_store.stored_guild_ids())
+        with db:
+            for guild_id in guild_ids:
+                records, next_id, _ = json_store.load(guild_id)
+                self._replace_guild(db, guild_id, records.values(), next_id)
+            db.execute(UPSERT_META, ('json_migrated', str(len(guild_ids))))
+        if guild_ids:
+            print(f'Imported truth bullets of {len(guild_ids)} guilds from JSON into {self.path}')
+        return len(guild_ids)
+
+    def close(self):
+        with self._connections_lock:
+            for db in self._connections:
+                db.execute('PRAGMA optimize')
+                db.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+def open_store(kind: str, db_path: str = 'data/truth_bullets.db'):
+    """Create the bullet store named by BULLET_STORAGE"""
+    if kind == 'json':
+        return JsonBulletStore()
+    if kind == 'sqlite':
+        return SqliteBulletStore(db_path)
+    raise ValueError(f"Unknown BULLET_STORAGE '{kind}', expected 'json' or 'sqlite'")
@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# Largest attachment accepted by !importbullets, and bullets per import
+MAX_IMPORT_BYTES = 8 * 1024 * 1024
+MAX_IMPORT_BULLETS = 5000
+
+# Discord's embed title and description limits
+MAX_NAME_LENGTH = 256
+MAX_DESCRIPTION_LENGTH = 4096
+
+# Validation errors listed back to the user
+MAX_REPORTED_ERRORS = 10
+
+# Exports stay in memory up to this size, then spill to a temporary file
+EXPORT_SPOOL_BYTES = 1024 * 1024
+
+FORMATS = ('json', 'jsonl', 'csv')
+CSV_FIELDS = ('id', 'name', 'description', 'image_url')
+
+class BulletImportError(ValueError):
+    """The file could not be read as a list of bullets at all"""
+
+def detect_format(filename: str) -> str:
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'ndjson':
+        return 'jsonl'
+    if extension in FORMATS:
+        return extension
+    raise BulletImportError(f"Unsupported file type '{filename}', expected .json, .jsonl or .csv")
+
+def _iter_json(stream: TextIO, chunk_size: int = 64 * 1024) -> Iterator[object]:
+    """Yield the items of a top-level JSON array one at a time, reading the text in chunks"""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size).lstrip()
+    eof = not buffer
+    if buffer.startswith('{'):
+        # A bullet file snapshot ({"bullets": {...}}) or {"bullets": [...]}: small enough to load whole
+        try:
+            data = json.loads(buffer + stream.read())
+        except json.JSONDecodeError as e:
+            raise BulletImportError(f"Invalid JSON: {e.msg} (character {e.pos})") from None
+        bullets = data.get('bullets') if isinstance(data, dict) else None
+        if isinstance(bullets, dict):
+            bullets = list(bullets.values())
+        if not isinstance(bullets, list):
+            raise BulletImportError("Expected a JSON array of bullets or an object with a 'bullets' list")
+        yield from bullets
+        return
+    if not buffer.startswith('['):
+        raise BulletImportError("Expected a JSON array of bullets")
+
+    pos = 1
+    expect_item = True
+    while True:
+        # Skip whitespace and separators, reading more text when the buffer runs out
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+        if pos >= len(buffer):
+            raise BulletImportError("The JSON array is not closed")
+        char = buffer[pos]
+        if char == ']':
+            return
+        if not expect_item:
+            if char != ',':
+                raise BulletImportError(f"Expected ',' or ']' in the JSON array, found '{char}'")
+            pos += 1
+            expect_item = True
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise BulletImportError(f"Invalid JSON: {e.msg} (character {e.pos})") from None
+            # The item may continue in the next chunk
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield item
+        pos = end
+        expect_item = False
+        # Drop what has been parsed so the buffer stays around one chunk
+        if pos > chunk_size:
+            buffer, pos = buffer[pos:], 0
+
+def _iter_jsonl(stream: TextIO) -> Iterator[object]:
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise BulletImportError(f"Invalid JSON on line {number}: {e.msg}") from None
+
+def _iter_csv(stream: TextIO) -> Iterator[object]:
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or 'name' not in reader.fieldnames or 'description' not in reader.fieldnames:
+        raise BulletImportError("The CSV file needs a header row with at least 'name' and 'description' columns")
+    yield from reader
+
+def _validate(item: object) -> Tuple[Optional[dict], Optional[str]]:
+    """Return (bullet fields, None) for a valid item or (None, reason)"""
+    if not isinstance(item, dict):
+        return None, "not an object"
+    name = item.get('name')
+    description = item.get('description')
+    image_url = item.get('image_url') or None
+    if not isinstance(name, str) or not name.strip():
+        return None, "missing name"
+    if not isinstance(description, str) or not description.strip():
+        return None, "missing description"
+    name, description = name.strip(), description.strip()
+    if len(name) > MAX_NAME_LENGTH:
+        return None, f"name longer than {MAX_NAME_LENGTH} characters"
+    if len(description) > MAX_DESCRIPTION_LENGTH:
+        return None, f"description longer than {MAX_DESCRIPTION_LENGTH} characters"
+    if image_url is not None and (not isinstance(image_url, str) or not image_url.startswith(('http://', 'https://'))):
+        return None, "image_url is not an http(s) URL"
+    return {'name': name, 'description': description, 'image_url': image_url}, None
+
+def parse_bullets(data: BinaryIO, fmt: str) -> Tuple[List[dict], List[str]]:
+    """Read bullets from a file one item at a time and validate each.
+
+    Returns (bullet fields, errors); IDs in the file are ignored, as the
+    manager assigns new ones.
+    """
+    stream = io.TextIOWrapper(data, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    items = {'json': _iter_json, 'jsonl': _iter_jsonl, 'csv': _iter_csv}[fmt](stream)
+    bullets = []
+    errors = []
+    try:
+        for number, item in enumerate(items, 1):
+            if number > MAX_IMPORT_BULLETS:
+                raise BulletImportError(f"More than {MAX_IMPORT_BULLETS} bullets in one file")
+            fields, reason = _validate(item)
+            if reason is not None:
+                errors.append(f"Bullet {number}: {reason}")
+            else:
+                bullets.append(fields)
+    except UnicodeDecodeError:
+        raise BulletImportError("The file is not UTF-8 text") from None
+    except (json.JSONDecodeError, RecursionError):
+        raise BulletImportError("The file is not valid JSON") from None
+    except csv.Error as e:
+        raise BulletImportError(f"Invalid CSV: {e}") from None
+    return bullets, errors
+
+def export_bullets(records: Iterable[dict], fmt: str) -> SpooledTemporaryFile:
+    """Write bullet records to a temporary file one at a time. Returns it rewound."""
+    spool = SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES, mode='w+b')
+    text = io.TextIOWrapper(spool, encoding='utf-8', newline='' if fmt == 'csv' else None, write_through=True)
+    if fmt == 'csv':
+        writer = csv.DictWriter(text, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+    elif fmt == 'jsonl':
+        for record in records:
+            text.write(json.dumps(record, ensure_ascii=False) + '\n')
+    else:
+        text.write('[')
+        for n, record in enumerate(records):
+            text.write((',\n  ' if n else '\n  ') + json.dumps(record, ensure_ascii=False))
+        text.write('\n]\n')
+    text.flush()
+    # Hand the binary file back without letting the wrapper close it
+    text.detach()
+    spool.seek(0)
+    return spool
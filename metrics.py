@@ -0,0 +1,308 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Tuple
+from discord.http import Ratelimit
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Window (seconds) of the event rates shown by !stats
+RATE_WINDOW = 60
+
+# Command (or event) the current task is running for, so REST calls and rate
+# limit waits can be attributed to it
+current_command: contextvars.ContextVar[str] = contextvars.ContextVar('current_command', default='none')
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (max for the overflow bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+class RateCounter:
+    """Event counter that also knows how many events happened in the last RATE_WINDOW seconds"""
+
+    def __init__(self, window: int = RATE_WINDOW):
+        self.window = window
+        self.total = 0
+        self._slots = [0] * window
+        self._slot_times = [0] * window
+
+    def add(self, amount: int = 1):
+        now = int(time.monotonic())
+        slot = now % self.window
+        if self._slot_times[slot] != now:
+            self._slot_times[slot] = now
+            self._slots[slot] = 0
+        self._slots[slot] += amount
+        self.total += amount
+
+    def per_second(self) -> float:
+        now = int(time.monotonic())
+        recent = sum(count for count, at in zip(self._slots, self._slot_times) if now - at < self.window)
+        return recent / self.window
+
+class _RateLimitLogHandler(logging.Handler):
+    """Picks the 429 retry delays out of discord.py's HTTP warnings"""
+
+    def __init__(self, metrics: 'Metrics'):
+        super().__init__(logging.WARNING)
+        self.metrics = metrics
+
+    def emit(self, record: logging.LogRecord):
+        message = str(record.msg)
+        if 'responded with 429' in message and 'Retrying in' in message and record.args:
+            self.metrics.rate_limit_wait(float(record.args[-1]))
+        elif message.startswith('Global rate limit has been hit') and record.args:
+            self.metrics.global_rate_limits += 1
+
+class Metrics:
+    """In-process metrics for commands, REST calls, rate limits and the event loop.
+
+    Everything is kept in plain dictionaries; render() produces the Prometheus
+    text exposition format, which write_file() drops on disk for a
+    node_exporter textfile collector (or anything else that scrapes files).
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.command_latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self.command_errors: Dict[str, int] = defaultdict(int)
+        # (command, route) -> calls, and command -> seconds spent in REST calls
+        self.rest_calls: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.rest_seconds: Dict[str, float] = defaultdict(float)
+        # command -> 429s and seconds slept because of them
+        self.rate_limits: Dict[str, int] = defaultdict(int)
+        self.rate_limit_seconds: Dict[str, float] = defaultdict(float)
+        # command -> requests held back by an exhausted bucket before being sent, and seconds held
+        self.bucket_waits: Dict[str, int] = defaultdict(int)
+        self.bucket_wait_seconds: Dict[str, float] = defaultdict(float)
+        self.global_rate_limits = 0
+        self.loop_lag = Histogram((0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+        self.last_loop_lag = 0.0
+        self.events: Dict[str, RateCounter] = defaultdict(RateCounter)
+        # Gauges and counters kept elsewhere are read when rendering: name -> (help, callable)
+        self.gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self.counters: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self._monitor: Optional[asyncio.Task] = None
+
+    # Recording
+
+    def start_command(self, name: str) -> Tuple[contextvars.Token, float]:
+        return current_command.set(name), time.perf_counter()
+
+    def end_command(self, name: str, started: Tuple[contextvars.Token, float], failed: bool = False):
+        token, start = started
+        self.command_latency[name].observe(time.perf_counter() - start)
+        if failed:
+            self.command_errors[name] += 1
+        try:
+            current_command.reset(token)
+        except ValueError:
+            # Reset from a different context than the one that set it
+            pass
+
+    def event(self, name: str, amount: int = 1):
+        self.events[name].add(amount)
+
+    def rate_limit_wait(self, seconds: float):
+        command = current_command.get()
+        self.rate_limits[command] += 1
+        self.rate_limit_seconds[command] += seconds
+
+    def bucket_wait(self, seconds: float):
+        command = current_command.get()
+        self.bucket_waits[command] += 1
+        self.bucket_wait_seconds[command] += seconds
+
+    @property
+    def rate_limit_wait_seconds(self) -> float:
+        """Seconds slept for rate limits of any kind: 429 retries and exhausted buckets"""
+        return sum(self.rate_limit_seconds.values()) + sum(self.bucket_wait_seconds.values())
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        self.gauges[name] = (help_text, read)
+
+    def counter(self, name: str, help_text: str, read: Callable[[], float]):
+        """Export a count kept elsewhere that only ever grows; name should end in _total"""
+        self.counters[name] = (help_text, read)
+
+    def instrument_http(self, http):
+        """Count and time every REST request made through a discord.py HTTPClient"""
+        request = http.request
+
+        async def timed_request(route, **kwargs):
+            command = current_command.get()
+            self.rest_calls[(command, f'{route.method} {route.path}')] += 1
+            start = time.perf_counter()
+            try:
+                return await request(route, **kwargs)
+            finally:
+                self.rest_seconds[command] += time.perf_counter() - start
+
+        http.request = timed_request
+        logging.getLogger('discord.http').addHandler(_RateLimitLogHandler(self))
+        self._instrument_buckets()
+
+    def _instrument_buckets(self):
+        """Time the waits discord.py makes before sending a request whose bucket is exhausted.
+
+        Those are only logged at debug level, so the bucket's acquire() is timed instead.
+        """
+        if getattr(Ratelimit.acquire, 'instrumented', False):
+            return
+        acquire = Ratelimit.acquire
+
+        async def timed_acquire(ratelimit):
+            if ratelimit.remaining > 0:
+                return await acquire(ratelimit)
+            start = time.perf_counter()
+            try:
+                return await acquire(ratelimit)
+            finally:
+                self.bucket_wait(time.perf_counter() - start)
+
+        timed_acquire.instrumented = True
+        Ratelimit.acquire = timed_acquire
+
+    # Background monitoring
+
+    def start(self, interval: float = 1.0, path: Optional[str] = None, write_every: float = 15.0):
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.create_task(self._run(interval, path, write_every))
+
+    async def _run(self, interval: float, path: Optional[str], write_every: float):
+        last_write = time.monotonic()
+        while True:
+            # Lag is how late the loop wakes us up after the requested sleep
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.last_loop_lag = max(0.0, time.perf_counter() - start - interval)
+            self.loop_lag.observe(self.last_loop_lag)
+            if path and time.monotonic() - last_write >= write_every:
+                last_write = time.monotonic()
+                try:
+                    await asyncio.to_thread(self.write_file, path, self.render())
+                except OSError as e:
+                    print(f'Could not write metrics to {path}: {e}')
+
+    # Exposition
+
+    def rest_calls_by_command(self) -> Dict[str, int]:
+        totals = defaultdict(int)
+        for (command, _), calls in self.rest_calls.items():
+            totals[command] += calls
+        return totals
+
+    def render(self) -> str:
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, labels, hist):
+            # labels is either empty or 'key="value",' so it can prefix the bucket bound
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {hist.count}')
+            suffix = f'{{{labels.rstrip(",")}}}' if labels else ''
+            lines.append(f'{name}_sum{suffix} {hist.total:.6f}')
+            lines.append(f'{name}_count{suffix} {hist.count}')
+
+        header('trialbot_command_seconds', 'histogram', 'Command latency in seconds')
+        for command, hist in sorted(self.command_latency.items()):
+            histogram('trialbot_command_seconds', f'command="{command}",', hist)
+
+        header('trialbot_command_errors_total', 'counter', 'Commands that ended with an error')
+        for command, count in sorted(self.command_errors.items()):
+            lines.append(f'trialbot_command_errors_total{{command="{command}"}} {count}')
+
+        header('trialbot_rest_requests_total', 'counter', 'REST requests by the command that made them')
+        for (command, route), count in sorted(self.rest_calls.items()):
+            lines.append(f'trialbot_rest_requests_total{{command="{command}",route="{route}"}} {count}')
+
+        header('trialbot_rest_seconds_total', 'counter', 'Seconds spent waiting on REST requests, rate limit waits included')
+        for command, seconds in sorted(self.rest_seconds.items()):
+            lines.append(f'trialbot_rest_seconds_total{{command="{command}"}} {seconds:.6f}')
+
+        header('trialbot_rate_limited_total', 'counter', 'REST requests answered with 429')
+        for command, count in sorted(self.rate_limits.items()):
+            lines.append(f'trialbot_rate_limited_total{{command="{command}"}} {count}')
+
+        header('trialbot_bucket_waits_total', 'counter', 'REST requests held back until their rate limit bucket reset')
+        for command, count in sorted(self.bucket_waits.items()):
+            lines.append(f'trialbot_bucket_waits_total{{command="{command}"}} {count}')
+
+        header('trialbot_rate_limit_wait_seconds_total', 'counter',
+               'Seconds slept for rate limits, after 429 responses or before sending to an exhausted bucket')
+        for command, seconds in sorted(self.rate_limit_seconds.items()):
+            lines.append(f'trialbot_rate_limit_wait_seconds_total{{command="{command}",cause="429"}} {seconds:.6f}')
+        for command, seconds in sorted(self.bucket_wait_seconds.items()):
+            lines.append(f'trialbot_rate_limit_wait_seconds_total{{command="{command}",cause="bucket"}} {seconds:.6f}')
+
+        header('trialbot_global_rate_limited_total', 'counter', 'Global rate limits hit')
+        lines.append(f'trialbot_global_rate_limited_total {self.global_rate_limits}')
+
+        header('trialbot_loop_lag_seconds', 'histogram', 'Event loop scheduling lag')
+        histogram('trialbot_loop_lag_seconds', '', self.loop_lag)
+
+        header('trialbot_events_total', 'counter', 'Gateway events handled')
+        for event, counter in sorted(self.events.items()):
+            lines.append(f'trialbot_events_total{{event="{event}"}} {counter.total}')
+
+        for name, (help_text, read) in sorted(self.counters.items()):
+            header(name, 'counter', help_text)
+            lines.append(f'{name} {read()}')
+
+        for name, (help_text, read) in sorted(self.gauges.items()):
+            header(name, 'gauge', help_text)
+            lines.append(f'{name} {read()}')
+
+        header('trialbot_start_time_seconds', 'gauge', 'Unix time the bot started')
+        lines.append(f'trialbot_start_time_seconds {self.started:.0f}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def write_file(path: str, text: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+# Shared metrics used by the bot
+metrics = Metrics()
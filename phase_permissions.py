@@ -0,0 +1,77 @@
+from typing import Dict, List, Optional, Union
+import discord
+
+# A phase maps each role/member to the permissions it should have in the channel,
+# or to None when its overwrite should be removed.
+PhaseOverwrites = Dict[Union[discord.Role, discord.Member], Optional[dict]]
+
+# channel_id -> overwrite sets the bot applied whose CHANNEL_UPDATE hasn't arrived yet, oldest first.
+# channel.edit() doesn't update the cached channel, so until then the cache is stale.
+_unconfirmed: Dict[int, List[dict]] = {}
+
+def _by_id(overwrites: dict) -> dict:
+    return {target.id: overwrite for target, overwrite in overwrites.items()}
+
+def current_overwrites(channel: discord.abc.GuildChannel) -> dict:
+    """The channel's overwrites, including edits the gateway cache doesn't show yet"""
+    applied = _unconfirmed.get(channel.id)
+    return applied[-1] if applied else channel.overwrites
+
+def confirm_overwrites(channel: discord.abc.GuildChannel):
+    """Catch up with a CHANNEL_UPDATE: drop the applied sets it confirms, or all of them after an outside edit"""
+    applied = _unconfirmed.get(channel.id)
+    if not applied:
+        return
+    seen = _by_id(channel.overwrites)
+    for n, overwrites in enumerate(applied):
+        if _by_id(overwrites) == seen:
+            del applied[:n + 1]
+            break
+    else:
+        applied.clear()
+    if not applied:
+        del _unconfirmed[channel.id]
+
+def forget_channel(channel: discord.abc.GuildChannel):
+    _unconfirmed.pop(channel.id, None)
+
+def plan_overwrites(channel: discord.abc.GuildChannel, phase: PhaseOverwrites) -> Optional[dict]:
+    """Work out the channel's full overwrite set after a phase change.
+
+    Returns None when the channel already matches the phase, so nothing needs sending.
+    """
+    current = current_overwrites(channel)
+    current_by_id = {target.id: target for target in current}
+    planned = dict(current)
+    changed = False
+
+    for target, permissions in phase.items():
+        if target is None:
+            continue
+        existing = current_by_id.get(target.id)
+
+        if permissions is None:
+            if existing is not None:
+                del planned[existing]
+                changed = True
+            continue
+
+        overwrite = discord.PermissionOverwrite(**permissions)
+        if existing is not None:
+            if current[existing] == overwrite:
+                continue
+            del planned[existing]
+        planned[target] = overwrite
+        changed = True
+
+    return planned if changed else None
+
+async def apply_phase(channel: discord.abc.GuildChannel, phase: PhaseOverwrites, reason: str) -> bool:
+    """Apply a phase's overwrites in a single channel edit. Returns False if nothing changed."""
+    overwrites = plan_overwrites(channel, phase)
+    if overwrites is None:
+        return False
+    edited = await channel.edit(overwrites=overwrites, reason=reason)
+    # Diff the next phase against what Discord now has, not the cache
+    _unconfirmed.setdefault(channel.id, []).append(edited.overwrites if edited is not None else overwrites)
+    return True
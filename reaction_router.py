@@ -0,0 +1,34 @@
+from typing import Awaitable, Callable, Dict
+import discord
+
+# Handlers receive the raw event and whether the reaction was added (True) or removed (False)
+ReactionHandler = Callable[[discord.RawReactionActionEvent, bool], Awaitable[None]]
+
+class ReactionRouter:
+    """Dispatches raw reaction events by message ID.
+
+    Only messages the bot is watching (team selection, votes, ...) are
+    registered, so a reaction anywhere else costs one dict miss.
+    """
+
+    def __init__(self):
+        self._routes: Dict[int, ReactionHandler] = {}
+
+    def __len__(self):
+        return len(self._routes)
+
+    def register(self, message_id: int, handler: ReactionHandler):
+        self._routes[message_id] = handler
+
+    def unregister(self, message_id: int):
+        self._routes.pop(message_id, None)
+
+    async def dispatch(self, payload: discord.RawReactionActionEvent, added: bool) -> bool:
+        handler = self._routes.get(payload.message_id)
+        if handler is None:
+            return False
+        await handler(payload, added)
+        return True
+
+# Shared router used by the reaction events
+reaction_router = ReactionRouter()
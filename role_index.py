@@ -0,0 +1,73 @@
+from typing import Dict, List, Set
+import discord
+
+class RoleHolderIndex:
+    """Tracks which members hold each trial role so commands never scan the whole guild.
+
+    A role is seeded from the member cache the first time it is looked up and is
+    kept current afterwards from member/role gateway events.
+    """
+
+    def __init__(self):
+        # guild_id -> role_id -> ids of members holding the role
+        self._holders: Dict[int, Dict[int, Set[int]]] = {}
+
+    def _role_ids(self, role: discord.Role) -> Set[int]:
+        guild_roles = self._holders.setdefault(role.guild.id, {})
+        member_ids = guild_roles.get(role.id)
+        if member_ids is None:
+            # One scan per role per process; events keep it current from here on
+            member_ids = guild_roles[role.id] = {member.id for member in role.members}
+        return member_ids
+
+    def holders(self, role: discord.Role) -> List[discord.Member]:
+        """Return the cached members currently holding the role"""
+        member_ids = self._role_ids(role)
+        members = []
+        for member_id in list(member_ids):
+            member = role.guild.get_member(member_id)
+            if member is None:
+                member_ids.discard(member_id)
+            else:
+                members.append(member)
+        return members
+
+    def add(self, member: discord.Member, role: discord.Role):
+        self._role_ids(role).add(member.id)
+
+    def discard(self, member: discord.Member, role: discord.Role):
+        guild_roles = self._holders.get(role.guild.id)
+        if guild_roles and role.id in guild_roles:
+            guild_roles[role.id].discard(member.id)
+
+    def reset(self, role: discord.Role):
+        """Record that nobody holds the role, e.g. after it was cleared in bulk"""
+        self._holders.setdefault(role.guild.id, {})[role.id] = set()
+
+    def on_member_update(self, before: discord.Member, after: discord.Member):
+        guild_roles = self._holders.get(after.guild.id)
+        if not guild_roles:
+            return
+        before_ids = {role.id for role in before.roles}
+        after_ids = {role.id for role in after.roles}
+        for role_id in before_ids ^ after_ids:
+            member_ids = guild_roles.get(role_id)
+            if member_ids is None:
+                continue
+            if role_id in after_ids:
+                member_ids.add(after.id)
+            else:
+                member_ids.discard(after.id)
+
+    def on_member_remove(self, member: discord.Member):
+        for member_ids in self._holders.get(member.guild.id, {}).values():
+            member_ids.discard(member.id)
+
+    def on_role_delete(self, role: discord.Role):
+        self._holders.get(role.guild.id, {}).pop(role.id, None)
+
+    def on_guild_remove(self, guild: discord.Guild):
+        self._holders.pop(guild.id, None)
+
+# Shared index used by the trial commands
+role_holders = RoleHolderIndex()
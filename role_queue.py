@@ -0,0 +1,161 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set, Tuple
+import discord
+from metrics import current_command
+
+@dataclass
+class PendingRoles:
+    # role_id -> whether the member should end up holding it
+    wanted: Dict[int, bool] = field(default_factory=dict)
+    due: float = 0.0
+    reason: Optional[str] = None
+
+class RoleUpdateQueue:
+    """Coalesces bursts of role changes into one role edit per member.
+
+    Every change to a member waits in a per-guild queue until they have been
+    quiet for `debounce` seconds; later changes are merged into the pending
+    entry, so someone flipping sides ten times is still one request. Each guild
+    drains at most `rate` edits per second, and members whose final roles match
+    what they already have are dropped without a request.
+    """
+
+    def __init__(self, debounce: float = 1.5, rate: float = 5.0):
+        self.debounce = debounce
+        self.rate = rate
+        self.merged = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        # guild_id -> member_id -> pending entry, ordered by last update
+        self._pending: Dict[int, OrderedDict[int, PendingRoles]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        # guild_id -> (member_id, entry) taken off the queue and waiting for its turn or being sent
+        self._current: Dict[int, Tuple[int, PendingRoles]] = {}
+        # guild_id -> (member_id, role ids the member ends up with, the edit request)
+        self._editing: Dict[int, Tuple[int, Set[int], asyncio.Future]] = {}
+
+    @property
+    def depth(self) -> int:
+        return sum(len(pending) for pending in self._pending.values())
+
+    def stats(self) -> dict:
+        return {
+            'depth': self.depth,
+            'merged': self.merged,
+            'dropped': self.dropped,
+            'sent': self.sent,
+            'failed': self.failed,
+        }
+
+    def enqueue(self, guild: discord.Guild, member_id: int,
+                add: Iterable[discord.Role] = (), remove: Iterable[discord.Role] = (),
+                reason: Optional[str] = None):
+        """Queue roles to add to and remove from a member, merging with any pending change"""
+        pending = self._pending.setdefault(guild.id, OrderedDict())
+        entry = pending.get(member_id)
+        if entry is None:
+            entry = pending[member_id] = PendingRoles()
+        else:
+            self.merged += 1
+            pending.move_to_end(member_id)
+
+        for role in remove:
+            entry.wanted[role.id] = False
+        for role in add:
+            entry.wanted[role.id] = True
+        entry.due = asyncio.get_running_loop().time() + self.debounce
+        entry.reason = reason or entry.reason
+
+        worker = self._workers.get(guild.id)
+        if worker is None or worker.done():
+            self._workers[guild.id] = asyncio.create_task(self._drain(guild))
+
+    async def cancel_roles(self, guild: discord.Guild, role_ids: Iterable[int]) -> Dict[int, Set[int]]:
+        """Forget every queued change to these roles in a guild, e.g. before they are cleared.
+
+        Waits for an edit already being sent and returns {member_id: role IDs}
+        for any of the roles it may have given, so the caller can take them away again.
+        """
+        role_ids = set(role_ids)
+        pending = self._pending.get(guild.id, {})
+        entries = list(pending.items())
+        if guild.id in self._current:
+            entries.append(self._current[guild.id])
+        for member_id, entry in entries:
+            for role_id in role_ids:
+                entry.wanted.pop(role_id, None)
+            if not entry.wanted and pending.get(member_id) is entry:
+                del pending[member_id]
+                self.dropped += 1
+
+        editing = self._editing.get(guild.id)
+        if editing is None:
+            return {}
+        member_id, final_ids, edit = editing
+        await asyncio.wait([edit])
+        given = final_ids & role_ids
+        return {member_id: given} if given else {}
+
+    @staticmethod
+    def _final_roles(member: discord.Member, wanted: Dict[int, bool]) -> Tuple[list, bool]:
+        current = [role for role in member.roles if not role.is_default()]
+        roles = [role for role in current if wanted.get(role.id, True)]
+        held = {role.id for role in roles}
+        for role_id, keep in wanted.items():
+            if keep and role_id not in held:
+                role = member.guild.get_role(role_id)
+                if role is not None:
+                    roles.append(role)
+        return roles, roles != current
+
+    async def _drain(self, guild: discord.Guild):
+        current_command.set('role_queue')
+        loop = asyncio.get_running_loop()
+        pending = self._pending[guild.id]
+        next_slot = loop.time()
+
+        while pending:
+            member_id, entry = next(iter(pending.items()))
+            delay = entry.due - loop.time()
+            if delay > 0:
+                # The head may be updated while we wait, so look again afterwards
+                await asyncio.sleep(delay)
+                continue
+            del pending[member_id]
+            self._current[guild.id] = (member_id, entry)
+
+            # Pace edits to the configured rate; cancel_roles() may still change the entry meanwhile
+            wait = next_slot - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            del self._current[guild.id]
+
+            member = guild.get_member(member_id)
+            if member is None:
+                self.dropped += 1
+                continue
+            roles, changed = self._final_roles(member, entry.wanted)
+            if not changed:
+                self.dropped += 1
+                continue
+            next_slot = max(next_slot, loop.time()) + 1 / self.rate
+
+            edit = asyncio.ensure_future(member.edit(roles=roles, reason=entry.reason))
+            self._editing[guild.id] = (member_id, {role.id for role in roles}, edit)
+            try:
+                await edit
+                self.sent += 1
+            except discord.HTTPException as e:
+                self.failed += 1
+                print(f'Failed to update roles for member {member_id} in guild {guild.id}: {e}')
+            finally:
+                del self._editing[guild.id]
+
+        del self._pending[guild.id]
+        self._workers.pop(guild.id, None)
+
+# Shared queue used for scrum team selection
+role_update_queue = RoleUpdateQueue()
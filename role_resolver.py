@@ -0,0 +1,44 @@
+from typing import Dict, List, Optional
+import discord
+
+class RoleResolver:
+    """Per-guild cache of role lookups by name and of the roles with Administrator.
+
+    Built from the guild's role cache on first use and dropped whenever a role is
+    created, updated or deleted, so lookups are O(1) between role changes.
+    """
+
+    def __init__(self):
+        # guild_id -> role name -> role ID (the lowest role with that name, like discord.utils.get)
+        self._by_name: Dict[int, Dict[str, int]] = {}
+        # guild_id -> IDs of roles granting Administrator
+        self._admin_roles: Dict[int, List[int]] = {}
+
+    def _build(self, guild: discord.Guild):
+        by_name = {}
+        admin_roles = []
+        for role in guild.roles:
+            by_name.setdefault(role.name, role.id)
+            if role.permissions.administrator and not role.is_default() and not role.managed:
+                admin_roles.append(role.id)
+        self._by_name[guild.id] = by_name
+        self._admin_roles[guild.id] = admin_roles
+
+    def get_named(self, guild: discord.Guild, name: str) -> Optional[discord.Role]:
+        if guild.id not in self._by_name:
+            self._build(guild)
+        role_id = self._by_name[guild.id].get(name)
+        return guild.get_role(role_id) if role_id else None
+
+    def admin_roles(self, guild: discord.Guild) -> List[discord.Role]:
+        if guild.id not in self._admin_roles:
+            self._build(guild)
+        roles = (guild.get_role(role_id) for role_id in self._admin_roles[guild.id])
+        return [role for role in roles if role is not None]
+
+    def invalidate(self, guild_id: int):
+        self._by_name.pop(guild_id, None)
+        self._admin_roles.pop(guild_id, None)
+
+# Shared resolver used by the trial commands
+role_resolver = RoleResolver()
@@ -0,0 +1,279 @@
+from types import SimpleNamespace
+from typing import Literal, Optional
+import discord
+from discord import app_commands
+from discord.ext import commands
+from truth_bullets import guild_managers
+from metrics import metrics
+
+def _message_kwargs(kwargs: dict) -> dict:
+    # Unset fields are left out rather than sent as None
+    return {key: value for key, value in kwargs.items() if value is not None}
+
+class HeldMessage:
+    """A command's first message, kept in memory until the command finishes"""
+
+    def __init__(self, kwargs: dict):
+        self.kwargs = kwargs
+        self.message: Optional[discord.Message] = None
+        self.dropped = False
+
+    async def edit(self, **kwargs):
+        if self.message is not None:
+            return await self.message.edit(**kwargs)
+        if not self.dropped:
+            self.kwargs.update(kwargs)
+
+class SlashContext:
+    """Runs a prefix command body for a slash command with a single followup.
+
+    The interaction is deferred before the command runs, so the user sees an
+    acknowledgement straight away. The command's first message (its "🔄 ..."
+    status message) is held in memory and its edits cost nothing; it goes out as
+    the one followup when the command ends. If the command sends another message
+    the held one was only a placeholder: it is dropped and the new message is sent
+    as the followup right away, so it is real (votes need its ID and reactions).
+    """
+
+    def __init__(self, interaction: discord.Interaction, attachments=()):
+        self.interaction = interaction
+        self.bot = interaction.client
+        self.guild = interaction.guild
+        self.channel = interaction.channel
+        self.author = interaction.user
+        self.message = SimpleNamespace(attachments=list(attachments))
+        self._held: Optional[HeldMessage] = None
+        self._sends = 0
+        self._followup_used = False
+
+    async def send(self, content=None, **kwargs):
+        kwargs['content'] = content
+        self._sends += 1
+        if self._sends == 1:
+            self._held = HeldMessage(kwargs)
+            return self._held
+
+        if self._held is not None and self._held.message is None:
+            self._held.dropped = True
+            self._held = None
+        if not self._followup_used:
+            self._followup_used = True
+            return await self.interaction.followup.send(wait=True, **_message_kwargs(kwargs))
+        return await self.channel.send(**_message_kwargs(kwargs))
+
+    async def finish(self):
+        held = self._held
+        if held is not None and held.message is None and not held.dropped:
+            self._followup_used = True
+            held.message = await self.interaction.followup.send(wait=True, **_message_kwargs(held.kwargs))
+        elif not self._followup_used:
+            await self.interaction.followup.send("✅ Done.")
+
+async def bullet_autocomplete(interaction: discord.Interaction, current: str):
+    """Suggest bullet names from the guild's prefix index"""
+    manager = await guild_managers.get(interaction.guild_id)
+    return [
+        app_commands.Choice(name=f"#{bullet.id}: {bullet.name}"[:100], value=str(bullet.id))
+        for bullet in manager.find_by_prefix(current, limit=25)
+    ]
+
+def setup_slash_commands(bot: commands.Bot):
+    """Register a slash version of every prefix command on the bot's command tree"""
+
+    async def run(interaction: discord.Interaction, name: str, *args, attachments=(), **kwargs):
+        started = metrics.start_command(f'/{name}')
+        failed = True
+        try:
+            await interaction.response.defer(thinking=True)
+            ctx = SlashContext(interaction, attachments)
+            await bot.get_command(name).callback(ctx, *args, **kwargs)
+            await ctx.finish()
+            failed = False
+        finally:
+            metrics.end_command(f'/{name}', started, failed=failed)
+
+    admin = app_commands.default_permissions(administrator=True)
+    is_admin = app_commands.checks.has_permissions(administrator=True)
+    can_manage_trial = app_commands.checks.bot_has_permissions(manage_roles=True, manage_channels=True)
+    can_manage_channel = app_commands.checks.bot_has_permissions(manage_channels=True)
+
+    @bot.tree.error
+    async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.MissingPermissions):
+            message = "You don't have permission to use this command. Administrator permission is required."
+        elif isinstance(error, app_commands.BotMissingPermissions):
+            message = "I don't have the required permissions to do this! I need: Manage Roles, Manage Channels"
+        else:
+            message = f"An error occurred: {str(error)}"
+        if interaction.response.is_done():
+            await interaction.followup.send(message, ephemeral=True)
+        else:
+            await interaction.response.send_message(message, ephemeral=True)
+
+    # Trial controls
+
+    @bot.tree.command(name='star', description="Give a user speaking permissions while locking the channel for others")
+    @admin
+    @is_admin
+    @can_manage_trial
+    async def star(interaction: discord.Interaction, member: discord.Member):
+        await run(interaction, 'star', member)
+
+    @bot.tree.command(name='unstar', description="Remove star status and restore normal channel permissions")
+    @admin
+    @is_admin
+    @can_manage_trial
+    async def unstar(interaction: discord.Interaction):
+        await run(interaction, 'unstar')
+
+    @bot.tree.command(name='refute', description="Start a rebuttal between two users")
+    @admin
+    @is_admin
+    @can_manage_trial
+    async def refute(interaction: discord.Interaction, user1: discord.Member, user2: discord.Member):
+        await run(interaction, 'refute', user1, user2)
+
+    @bot.tree.command(name='endrefute', description="End the rebuttal and start a vote")
+    @app_commands.describe(vote_seconds="Close the vote automatically after this many seconds")
+    @admin
+    @is_admin
+    @can_manage_trial
+    async def end_refute(interaction: discord.Interaction, vote_seconds: int = 0):
+        await run(interaction, 'endrefute', vote_seconds)
+
+    @bot.tree.command(name='intermission', description="Lock the channel for everyone except administrators")
+    @app_commands.describe(seconds="Resume the trial automatically after this many seconds")
+    @admin
+    @is_admin
+    @can_manage_channel
+    async def intermission(interaction: discord.Interaction, seconds: int = 0):
+        await run(interaction, 'intermission', seconds)
+
+    @bot.tree.command(name='resume', description="End the intermission and unlock the channel")
+    @admin
+    @is_admin
+    @can_manage_channel
+    async def resume(interaction: discord.Interaction):
+        await run(interaction, 'resume')
+
+    @bot.tree.command(name='topic', description="Set the forced topic in the channel description")
+    @admin
+    @is_admin
+    @can_manage_channel
+    async def set_topic(interaction: discord.Interaction, topic: str):
+        await run(interaction, 'topic', topic=topic)
+
+    @bot.tree.command(name='cleartopic', description="Clear the forced topic from the channel description")
+    @admin
+    @is_admin
+    @can_manage_channel
+    async def clear_topic(interaction: discord.Interaction):
+        await run(interaction, 'cleartopic')
+
+    # Scrum Debate
+
+    @bot.tree.command(name='scrumdebate', description="Queue a Scrum Debate with Side A and Side B teams")
+    @admin
+    @is_admin
+    @can_manage_trial
+    async def scrum_debate(interaction: discord.Interaction):
+        await run(interaction, 'scrumdebate')
+
+    @bot.tree.command(name='startscrum', description="Begin the Scrum Debate with Side A speaking")
+    @app_commands.describe(turn_seconds="Swap sides automatically after this many seconds per turn")
+    @admin
+    @is_admin
+    @can_manage_trial
+    async def start_scrum(interaction: discord.Interaction, turn_seconds: int = 0):
+        await run(interaction, 'startscrum', turn_seconds)
+
+    @bot.tree.command(name='swap', description="Swap which side can speak in the Scrum Debate")
+    @admin
+    @is_admin
+    @can_manage_trial
+    async def swap_sides(interaction: discord.Interaction):
+        await run(interaction, 'swap')
+
+    @bot.tree.command(name='endscrum', description="End the Scrum Debate and start a vote")
+    @app_commands.describe(vote_seconds="Close the vote automatically after this many seconds")
+    @admin
+    @is_admin
+    @can_manage_trial
+    async def end_scrum(interaction: discord.Interaction, vote_seconds: int = 0):
+        await run(interaction, 'endscrum', vote_seconds)
+
+    @bot.tree.command(name='rolequeue', description="Show pending and merged team selection role updates")
+    @admin
+    @is_admin
+    async def role_queue_status(interaction: discord.Interaction):
+        await run(interaction, 'rolequeue')
+
+    @bot.tree.command(name='topicqueue', description="Show channel topics waiting for Discord's edit limit")
+    @admin
+    @is_admin
+    async def topic_queue_status(interaction: discord.Interaction):
+        await run(interaction, 'topicqueue')
+
+    # Voting
+
+    @bot.tree.command(name='endvote', description="End the current vote and announce the winner")
+    @admin
+    @is_admin
+    async def end_vote(interaction: discord.Interaction):
+        await run(interaction, 'endvote')
+
+    @bot.tree.command(name='tally', description="Show the running count of the current vote")
+    async def show_tally(interaction: discord.Interaction):
+        await run(interaction, 'tally')
+
+    # Truth bullets
+
+    @bot.tree.command(name='addbullet', description="Add a truth bullet")
+    @admin
+    @is_admin
+    async def add_bullet(interaction: discord.Interaction, name: str, description: str,
+                         image: Optional[discord.Attachment] = None):
+        await run(interaction, 'addbullet', name, description=description,
+                  attachments=[image] if image else [])
+
+    @bot.tree.command(name='removebullet', description="Remove a truth bullet by ID or name")
+    @app_commands.autocomplete(identifier=bullet_autocomplete)
+    @admin
+    @is_admin
+    async def remove_bullet(interaction: discord.Interaction, identifier: str):
+        await run(interaction, 'removebullet', identifier)
+
+    @bot.tree.command(name='bullet', description="Show a truth bullet by ID or name")
+    @app_commands.autocomplete(identifier=bullet_autocomplete)
+    async def show_bullet(interaction: discord.Interaction, identifier: str):
+        await run(interaction, 'bullet', identifier)
+
+    @bot.tree.command(name='bullets', description="List all truth bullets")
+    async def list_bullets(interaction: discord.Interaction, page: int = 1):
+        await run(interaction, 'bullets', page)
+
+    @bot.tree.command(name='searchbullets', description="Search truth bullet names and descriptions")
+    async def search_bullets(interaction: discord.Interaction, query: str):
+        await run(interaction, 'searchbullets', query=query)
+
+    @bot.tree.command(name='importbullets', description="Add truth bullets from a .json, .jsonl or .csv file")
+    @admin
+    @is_admin
+    async def import_bullets(interaction: discord.Interaction, file: discord.Attachment):
+        await run(interaction, 'importbullets', attachments=[file])
+
+    @bot.tree.command(name='exportbullets', description="Download every truth bullet as a file")
+    @admin
+    @is_admin
+    async def export_bullets(interaction: discord.Interaction, format: Literal['json', 'jsonl', 'csv'] = 'json'):
+        await run(interaction, 'exportbullets', format)
+
+    @bot.tree.command(name='stats', description="Show command latency, REST usage, rate limits and state sizes")
+    @admin
+    @is_admin
+    async def show_stats(interaction: discord.Interaction):
+        await run(interaction, 'stats')
+
+    @bot.tree.command(name='ping', description="Show the bot's latency")
+    async def ping(interaction: discord.Interaction):
+        await run(interaction, 'ping')
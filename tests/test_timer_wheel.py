@@ -0,0 +1,48 @@
+import asyncio
+import time
+from timer_wheel import TimerWheel
+
+def test_deadlines_fire_on_or_after_their_due_time():
+    async def run():
+        fired = {}
+        done = asyncio.Event()
+
+        async def on_timer(key):
+            fired[key] = time.time()
+            if len(fired) == len(due):
+                done.set()
+
+        wheel = TimerWheel(on_timer, tick=0.05)
+        now = time.time()
+        due = {n: now + 0.03 + n * 0.07 for n in range(5)}
+        for key, when in due.items():
+            wheel.schedule(key, when)
+        wheel.start()
+        try:
+            await asyncio.wait_for(done.wait(), timeout=2.0)
+        finally:
+            wheel.stop()
+        return fired, due
+
+    fired, due = asyncio.run(run())
+    for key, when in due.items():
+        # Never early, and at most about one tick late
+        assert when <= fired[key] < when + 0.15
+
+def test_cancelled_deadline_does_not_fire():
+    async def run():
+        fired = []
+
+        async def on_timer(key):
+            fired.append(key)
+
+        wheel = TimerWheel(on_timer, tick=0.02)
+        wheel.schedule('kept', time.time() + 0.05)
+        wheel.schedule('cancelled', time.time() + 0.05)
+        wheel.cancel('cancelled')
+        wheel.start()
+        await asyncio.sleep(0.2)
+        wheel.stop()
+        return fired
+
+    assert asyncio.run(run()) == ['kept']
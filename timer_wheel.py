@@ -0,0 +1,121 @@
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+class TimerWheel:
+    """Hierarchical timing wheel driven by a single asyncio task.
+
+    Level 0 has one slot per tick; each higher level has slots covering a whole
+    turn of the level below. A timer sits in the lowest level whose span covers
+    its delay and is cascaded down as its time approaches, so scheduling and
+    cancelling are O(1) and each tick only touches the timers that are due.
+    Deadlines are wall-clock timestamps, so they stay meaningful across restarts.
+    """
+
+    def __init__(self, callback: Callable[[Hashable], Awaitable[None]],
+                 tick: float = 1.0, slot_bits: int = 6, levels: int = 4):
+        self.callback = callback
+        self.tick = tick
+        self.slot_bits = slot_bits
+        self.slot_count = 1 << slot_bits
+        self.levels = levels
+        self._wheels: List[List[Set[Hashable]]] = [
+            [set() for _ in range(self.slot_count)] for _ in range(levels)
+        ]
+        # key -> (due tick, level, slot)
+        self._timers: Dict[Hashable, Tuple[int, int, int]] = {}
+        self._overdue: Set[Hashable] = set()
+        self._current_tick = self._tick_for(time.time())
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable):
+        return key in self._timers
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _tick_for(self, timestamp: float) -> int:
+        return int(timestamp // self.tick)
+
+    def _place(self, key: Hashable, due_tick: int):
+        delta = due_tick - self._current_tick
+        if delta <= 0:
+            self._overdue.add(key)
+            self._timers[key] = (due_tick, -1, -1)
+            return
+        level = 0
+        while level < self.levels - 1 and delta >= 1 << (self.slot_bits * (level + 1)):
+            level += 1
+        slot = (due_tick >> (self.slot_bits * level)) & (self.slot_count - 1)
+        self._wheels[level][slot].add(key)
+        self._timers[key] = (due_tick, level, slot)
+
+    def schedule(self, key: Hashable, due: float):
+        """Fire callback(key) at the wall-clock time due, replacing any timer with the same key"""
+        self.cancel(key)
+        # Ticks fire at their start, so round up to never fire before due
+        self._place(key, math.ceil(due / self.tick))
+
+    def cancel(self, key: Hashable) -> bool:
+        entry = self._timers.pop(key, None)
+        if entry is None:
+            return False
+        _, level, slot = entry
+        if level < 0:
+            self._overdue.discard(key)
+        else:
+            self._wheels[level][slot].discard(key)
+        return True
+
+    def _advance(self) -> List[Hashable]:
+        """Move one tick forward and return the keys that are now due"""
+        self._current_tick += 1
+        tick = self._current_tick
+
+        # Cascade higher levels whose slot starts at this tick down towards level 0
+        for level in range(1, self.levels):
+            if tick & ((1 << (self.slot_bits * level)) - 1):
+                break
+            slot = (tick >> (self.slot_bits * level)) & (self.slot_count - 1)
+            keys = self._wheels[level][slot]
+            self._wheels[level][slot] = set()
+            for key in keys:
+                self._place(key, self._timers[key][0])
+
+        slot = tick & (self.slot_count - 1)
+        due = [key for key in self._wheels[0][slot] if self._timers[key][0] <= tick]
+        due.extend(self._overdue)
+        self._overdue = set()
+        for key in due:
+            self.cancel(key)
+        return due
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            # Catch up on every tick that has passed, e.g. after a stall or at startup
+            target = self._tick_for(time.time())
+            while self._current_tick < target:
+                for key in self._advance():
+                    asyncio.create_task(self._fire(key))
+            next_tick = (self._current_tick + 1) * self.tick
+            await asyncio.sleep(max(0.0, next_tick - time.time()))
+
+    async def _fire(self, key: Hashable):
+        try:
+            await self.callback(key)
+        except Exception as e:
+            print(f'Timer {key} failed: {e}')
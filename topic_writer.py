@@ -0,0 +1,161 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+import discord
+from metrics import current_command
+
+FORCED_TOPIC_MARKER = "【FORCED TOPIC】"
+
+# Discord's limit on channel topic length
+MAX_TOPIC_LENGTH = 1024
+
+def split_topic(topic: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Split a channel topic into the channel's own description and the forced topic, if there is one"""
+    topic = topic or ""
+    if FORCED_TOPIC_MARKER not in topic:
+        return topic, None
+    base, forced = topic.split(FORCED_TOPIC_MARKER)[:2]
+    return base.strip(), forced.strip()
+
+def compose_topic(base: str, forced: Optional[str]) -> str:
+    if forced is None:
+        return base
+    return f"{base}\n\n{FORCED_TOPIC_MARKER}\n{forced}" if base else f"{FORCED_TOPIC_MARKER}\n{forced}"
+
+@dataclass
+class ChannelTopic:
+    # The channel's own description, kept in front of the forced topic section
+    base: str
+    # The forced topic wanted now (None once cleared)
+    forced: Optional[str]
+    # The topic the channel has, as last written or read
+    written: str
+    due: float = 0.0
+    error: Optional[str] = None
+
+class TopicWriter:
+    """Keeps the forced topic wanted for each channel and writes it when Discord allows.
+
+    Discord allows only `edits` topic edits per channel every `per` seconds.
+    The channel description is parsed once, and updates are merged in memory,
+    so only the latest topic is written once the channel has an edit left.
+    Later updates never wait behind earlier ones, and commands never wait at all.
+    """
+
+    def __init__(self, edits: int = 2, per: float = 600.0, debounce: float = 1.5):
+        self.edits = edits
+        self.per = per
+        self.debounce = debounce
+        self.merged = 0
+        self.sent = 0
+        self.failed = 0
+        self._topics: Dict[int, ChannelTopic] = {}
+        # channel_id -> loop times of the bot's recent topic edits
+        self._edit_times: Dict[int, Deque[float]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    @property
+    def depth(self) -> int:
+        return len(self._workers)
+
+    def stats(self) -> dict:
+        return {
+            'depth': self.depth,
+            'merged': self.merged,
+            'sent': self.sent,
+            'failed': self.failed,
+        }
+
+    def _state(self, channel: discord.TextChannel) -> ChannelTopic:
+        state = self._topics.get(channel.id)
+        live = channel.topic or ""
+        if state is None or (live != state.written and channel.id not in self._workers):
+            # First use, or the description was edited outside the bot since
+            base, forced = split_topic(live)
+            state = self._topics[channel.id] = ChannelTopic(base, forced, live)
+        return state
+
+    def forced_topic(self, channel: discord.TextChannel) -> Optional[str]:
+        """The channel's forced topic, including changes not written yet"""
+        return self._state(channel).forced
+
+    def set(self, channel: discord.TextChannel, forced: Optional[str]) -> float:
+        """Queue a new forced topic (None clears it). Returns the seconds until it is written."""
+        state = self._state(channel)
+        topic = compose_topic(state.base, forced)
+        if len(topic) > MAX_TOPIC_LENGTH:
+            raise ValueError(f"The channel description would be {len(topic)} characters long, "
+                             f"the limit is {MAX_TOPIC_LENGTH}")
+
+        loop = asyncio.get_running_loop()
+        worker = self._workers.get(channel.id)
+        if worker is not None and not worker.done():
+            self.merged += 1
+        state.forced = forced
+        state.due = loop.time() + self.debounce
+        state.error = None
+        if worker is None or worker.done():
+            self._workers[channel.id] = asyncio.create_task(self._drain(channel, state))
+        return self.wait_time(channel.id)
+
+    def _next_edit(self, channel_id: int, now: float) -> float:
+        """Loop time at which the channel has a topic edit left"""
+        edit_times = self._edit_times.get(channel_id)
+        if not edit_times:
+            return now
+        while edit_times and edit_times[0] <= now - self.per:
+            edit_times.popleft()
+        if len(edit_times) < self.edits:
+            return now
+        return edit_times[0] + self.per
+
+    def wait_time(self, channel_id: int) -> float:
+        state = self._topics.get(channel_id)
+        if state is None or channel_id not in self._workers:
+            return 0.0
+        now = asyncio.get_running_loop().time()
+        return max(0.0, state.due - now, self._next_edit(channel_id, now) - now)
+
+    def pending(self) -> List[Tuple[int, ChannelTopic, float]]:
+        """(channel_id, state, seconds until written) of every channel with a topic change queued"""
+        return [(channel_id, self._topics[channel_id], self.wait_time(channel_id))
+                for channel_id in list(self._workers)]
+
+    def failures(self) -> List[Tuple[int, ChannelTopic]]:
+        return [(channel_id, state) for channel_id, state in self._topics.items()
+                if state.error and channel_id not in self._workers]
+
+    async def _drain(self, channel: discord.TextChannel, state: ChannelTopic):
+        current_command.set('topic_writer')
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                topic = compose_topic(state.base, state.forced)
+                if topic == state.written:
+                    return
+                now = loop.time()
+                delay = max(state.due, self._next_edit(channel.id, now)) - now
+                if delay > 0:
+                    # More updates may arrive while we wait; only the latest is written
+                    await asyncio.sleep(delay)
+                    continue
+                self._edit_times.setdefault(channel.id, deque()).append(now)
+                try:
+                    await channel.edit(topic=topic)
+                except discord.NotFound:
+                    self._topics.pop(channel.id, None)
+                    return
+                except discord.HTTPException as e:
+                    # Kept until the next update, which tries again
+                    self.failed += 1
+                    state.error = "missing permission" if isinstance(e, discord.Forbidden) else str(e)
+                    print(f'Failed to update the topic of channel {channel.id}: {e}')
+                    return
+                state.written = topic
+                self.sent += 1
+        finally:
+            self._workers.pop(channel.id, None)
+
+# Shared writer for the forced topic of every channel
+topic_writer = TopicWriter()
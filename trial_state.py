@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+from functools import partial
+from typing import Dict, Optional
+from bullet_io import bullet_writer
+
+class TrialStateStore:
+    """Holds the per-channel trial dictionaries and persists them to disk.
+
+    Records only contain IDs (roles, members, messages, channels) so they can be
+    written as-is and resolved again from the gateway cache after a restart.
+    Writes are buffered: marking the store dirty schedules a single flush a
+    moment later, however many changes happen in between. The state is
+    serialized on the event loop and written on bullet_writer's I/O thread.
+    """
+
+    TABLES = ('starred_roles', 'refuter_roles', 'active_votes', 'scrum_debates', 'deadlines', 'intermissions')
+
+    # Version 1 keyed every table by guild, version 2 keys them by channel
+    VERSION = 2
+
+    def __init__(self, path: str = 'data/trial_state.json', flush_delay: float = 2.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.starred_roles: Dict[int, int] = {}
+        self.refuter_roles: Dict[int, int] = {}
+        self.active_votes: Dict[int, dict] = {}
+        self.scrum_debates: Dict[int, dict] = {}
+        # channel_id -> kind -> {'due': timestamp, 'interval': seconds (repeating deadlines only)}
+        self.deadlines: Dict[int, dict] = {}
+        # channel_id -> {'started': timestamp} while the channel is in intermission
+        self.intermissions: Dict[int, dict] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            print(f'Ignoring unreadable trial state file {self.path}')
+            return
+
+        if data.get('version', 1) < 2:
+            # Debates and votes know their channel; the guild-wide role IDs are dropped
+            for table in ('active_votes', 'scrum_debates'):
+                data[table] = {str(record['channel_id']): record for record in data.get(table, {}).values()}
+            data['starred_roles'] = {}
+            data['refuter_roles'] = {}
+
+        if 'intermissions' not in data:
+            # Older files only know an intermission by its automatic resume
+            data['intermissions'] = {
+                channel_id: {'started': None}
+                for channel_id, kinds in data.get('deadlines', {}).items() if 'resume' in kinds
+            }
+
+        for table in self.TABLES:
+            getattr(self, table).update({int(k): v for k, v in data.get(table, {}).items()})
+
+    def mark_dirty(self):
+        """Schedule a write of the current state, coalescing with any pending one"""
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.flush_delay, self._flush_in_background)
+
+    def _serialize(self) -> str:
+        # Tables are only changed on the event loop, so this is a consistent snapshot
+        state = {table: getattr(self, table) for table in self.TABLES}
+        state['version'] = self.VERSION
+        return json.dumps(state, separators=(',', ':'))
+
+    def _flush_in_background(self):
+        self._flush_handle = None
+        future = asyncio.wrap_future(bullet_writer.submit_job(partial(self._write, self.path, self._serialize())))
+        future.add_done_callback(self._written)
+
+    def _written(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f'Failed to save trial state: {future.exception()}')
+            self.mark_dirty()
+
+    def flush(self):
+        """Write the state now and wait for it, e.g. at shutdown"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # Through the I/O thread too, so an earlier background write can't land after this one
+        bullet_writer.submit_job(partial(self._write, self.path, self._serialize())).result()
+
+    @staticmethod
+    def _write(path: str, data: str):
+        """Replace the state file atomically"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+# Shared store used by the trial commands
+trial_state = TrialStateStore()
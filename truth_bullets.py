@@ -1,8 +1,51 @@
-import json
-import os
+import asyncio
+import bisect
+from collections import OrderedDict
 from dataclasses import dataclass, asdict
-from typing import Optional, Dict
+from functools import partial
+from typing import Iterable, Optional, Dict, List
 import discord
+from bullet_search import BulletSearchIndex, make_snippet, tokenize
+from bullet_pages import render_pages
+from bullet_io import bullet_writer
+from bullet_storage import JsonBulletStore
+from bullet_images import image_store
+
+class EmbedCache:
+    """LRU cache of rendered truth bullet embeds, shared by every command that shows a bullet.
+
+    Entries are keyed on the bullet's ID and content, so an edited bullet never
+    gets a stale embed; removed bullets are dropped explicitly.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._embeds: OrderedDict[tuple, discord.Embed] = OrderedDict()
+
+    def __len__(self):
+        return len(self._embeds)
+
+    def get(self, key: tuple) -> Optional[discord.Embed]:
+        embed = self._embeds.get(key)
+        if embed is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._embeds.move_to_end(key)
+        return embed
+
+    def put(self, key: tuple, embed: discord.Embed):
+        self._embeds[key] = embed
+        self._embeds.move_to_end(key)
+        if len(self._embeds) > self.max_size:
+            self._embeds.popitem(last=False)
+
+    def discard(self, key: tuple):
+        self._embeds.pop(key, None)
+
+embed_cache = EmbedCache()
 
 @dataclass
 class TruthBullet:
@@ -10,6 +53,8 @@ class TruthBullet:
     name: str
     description: str
     image_url: Optional[str] = None
+    # SHA-256 of the image in image_store, if it was cached
+    image_hash: Optional[str] = None
     
     def to_dict(self):
         return asdict(self)
@@ -18,80 +63,332 @@ class TruthBullet:
     def from_dict(cls, data):
         return cls(**data)
     
-    def to_embed(self) -> discord.Embed:
+    def cache_key(self) -> tuple:
+        return (self.id, self.name, self.description, self.image_url, self.image_hash)
+    
+    def to_embed(self, attachment: Optional[str] = None) -> discord.Embed:
+        """Return this bullet's embed, rendered once and shared from embed_cache.
+
+        With attachment, the image is shown from the file attached under that name.
+        """
+        key = self.cache_key() + (attachment,)
+        embed = embed_cache.get(key)
+        if embed is None:
+            embed = self._render_embed(attachment)
+            embed_cache.put(key, embed)
+        return embed
+    
+    def to_message(self) -> dict:
+        """send() keyword arguments for this bullet: its embed, plus the cached image file if there is one"""
+        image = image_store.lookup(self.image_hash) if self.image_hash else None
+        if image is None:
+            return {'embed': self.to_embed()}
+        return {
+            'embed': self.to_embed(image.filename),
+            'file': discord.File(image.attachment_path, filename=image.filename)
+        }
+    
+    def discard_embeds(self):
+        embed_cache.discard(self.cache_key() + (None,))
+        image = image_store.peek(self.image_hash) if self.image_hash else None
+        if image is not None:
+            embed_cache.discard(self.cache_key() + (image.filename,))
+    
+    def _render_embed(self, attachment: Optional[str] = None) -> discord.Embed:
         embed = discord.Embed(
             title=f"Truth Bullet #{self.id}: {self.name}",
             description=self.description,
             color=discord.Color.gold()
         )
-        if self.image_url:
+        if attachment:
+            # The CDN link in image_url expires; a re-attached copy of the image doesn't
+            embed.set_image(url=f"attachment://{attachment}")
+        elif self.image_url:
             embed.set_image(url=self.image_url)
         return embed
 
+# Journal entries kept before compacting into the snapshot, unless the guild has more bullets
+MIN_COMPACT_ENTRIES = 256
+
 class TruthBulletManager:
-    def __init__(self, guild_id: int):
+    """Holds a guild's truth bullets in memory and records every change in its store.
+
+    Each mutation queues one journal entry, and the shared bullet_writer hands
+    a burst of entries at a time to the store on its I/O thread. With the JSON
+    store the journal is compacted into a fresh snapshot once it grows past the
+    number of bullets, so the cost per mutation stays constant however many
+    bullets the guild has.
+    """
+
+    def __init__(self, guild_id: int, store=None):
         self.guild_id = guild_id
+        self.store = store if store is not None else JsonBulletStore()
         self.bullets: Dict[int, TruthBullet] = {}
         self.next_id = 1
+        self._journal_entries = 0
+        # Journal entries not handed to the writer yet, and whether the next write is a full snapshot
+        self._pending_entries: List[dict] = []
+        self._needs_snapshot = False
+        # Case-folded name -> ids of bullets with that name, lowest first
+        self._name_index: Dict[str, List[int]] = {}
+        # Sorted case-folded names, for prefix lookups with bisect
+        self._sorted_names: List[str] = []
+        # Full-text index over names and descriptions
+        self.search_index = BulletSearchIndex()
+        # Bumped on every mutation; rendered pages are cached for one version
+        self.version = 0
+        self._pages: Optional[List[discord.Embed]] = None
+        self._pages_version = -1
         self._load_bullets()
     
-    def _get_storage_path(self) -> str:
-        os.makedirs('data', exist_ok=True)
-        return f'data/truth_bullets_{self.guild_id}.json'
-    
     def _load_bullets(self):
-        try:
-            with open(self._get_storage_path(), 'r') as f:
-                data = json.load(f)
-                self.bullets = {
-                    int(k): TruthBullet.from_dict(v) 
-                    for k, v in data['bullets'].items()
-                }
-                self.next_id = data['next_id']
-        except FileNotFoundError:
-            self.bullets = {}
-            self.next_id = 1
-    
-    def _save_bullets(self):
-        with open(self._get_storage_path(), 'w') as f:
-            json.dump({
-                'bullets': {str(k): v.to_dict() for k, v in self.bullets.items()},
-                'next_id': self.next_id
-            }, f, indent=2)
-    
-    def add_bullet(self, name: str, description: str, image_url: Optional[str] = None) -> TruthBullet:
+        records, self.next_id, self._journal_entries = self.store.load(self.guild_id)
+        self.bullets = {bullet_id: TruthBullet.from_dict(record) for bullet_id, record in records.items()}
+        self._rebuild_indexes()
+    
+    def _rebuild_indexes(self):
+        self._name_index = {}
+        for bullet_id in sorted(self.bullets):
+            self._name_index.setdefault(self.bullets[bullet_id].name.casefold(), []).append(bullet_id)
+        self._sorted_names = sorted(self._name_index)
+        self.search_index.rebuild(self.bullets.values())
+    
+    def _index_bullet(self, bullet: TruthBullet):
+        key = bullet.name.casefold()
+        ids = self._name_index.get(key)
+        if ids is None:
+            self._name_index[key] = [bullet.id]
+            bisect.insort(self._sorted_names, key)
+        else:
+            bisect.insort(ids, bullet.id)
+    
+    def _unindex_bullet(self, bullet: TruthBullet):
+        key = bullet.name.casefold()
+        ids = self._name_index.get(key)
+        if not ids:
+            return
+        ids.remove(bullet.id)
+        if not ids:
+            del self._name_index[key]
+            del self._sorted_names[bisect.bisect_left(self._sorted_names, key)]
+    
+    def _names_with_prefix(self, prefix: str, limit: int) -> List[str]:
+        names = []
+        for i in range(bisect.bisect_left(self._sorted_names, prefix), len(self._sorted_names)):
+            name = self._sorted_names[i]
+            if not name.startswith(prefix) or len(names) >= limit:
+                break
+            names.append(name)
+        return names
+    
+    def _append_journal(self, entry: dict):
+        self._pending_entries.append(entry)
+        self._journal_entries += 1
+        if self.store.compacts and self._journal_entries > max(MIN_COMPACT_ENTRIES, len(self.bullets)):
+            self._needs_snapshot = True
+        bullet_writer.mark_dirty(self)
+    
+    def take_write(self):
+        """Capture the changes since the last write and return a job that writes them off the event loop"""
+        if self._needs_snapshot:
+            # Bullets are never modified in place, so a shallow copy is a consistent snapshot
+            job = partial(self._write_snapshot, dict(self.bullets), self.next_id)
+            self._needs_snapshot = False
+            self._journal_entries = 0
+        elif self._pending_entries:
+            job = partial(self.store.append, self.guild_id, self._pending_entries, self.next_id)
+        else:
+            return None
+        self._pending_entries = []
+        return job
+    
+    def write_failed(self):
+        self._needs_snapshot = True
+    
+    def _write_snapshot(self, bullets: Dict[int, TruthBullet], next_id: int):
+        records = {bullet_id: bullet.to_dict() for bullet_id, bullet in bullets.items()}
+        self.store.write_snapshot(self.guild_id, records, next_id)
+    
+    def add_bullet(self, name: str, description: str, image_url: Optional[str] = None,
+                   image_hash: Optional[str] = None) -> TruthBullet:
         bullet = TruthBullet(
             id=self.next_id,
             name=name,
             description=description,
-            image_url=image_url
+            image_url=image_url,
+            image_hash=image_hash
         )
         self.bullets[bullet.id] = bullet
         self.next_id += 1
-        self._save_bullets()
+        self._index_bullet(bullet)
+        self.search_index.add(bullet)
+        self.version += 1
+        self._append_journal({'op': 'add', 'bullet': bullet.to_dict()})
         return bullet
-    
+
+    def add_bullets(self, items: Iterable[dict]) -> List[TruthBullet]:
+        """Add many bullets with consecutive IDs; they reach the store in the same write"""
+        added = []
+        for item in items:
+            bullet = TruthBullet(id=self.next_id + len(added), **item)
+            self.bullets[bullet.id] = bullet
+            self._index_bullet(bullet)
+            self.search_index.add(bullet)
+            added.append(bullet)
+        if added:
+            self.next_id += len(added)
+            self.version += 1
+            for bullet in added:
+                self._append_journal({'op': 'add', 'bullet': bullet.to_dict()})
+        return added
+
     def remove_bullet(self, bullet_id: int) -> bool:
         if bullet_id in self.bullets:
-            del self.bullets[bullet_id]
-            self._save_bullets()
+            bullet = self.bullets.pop(bullet_id)
+            self._unindex_bullet(bullet)
+            bullet.discard_embeds()
+            self.search_index.remove(bullet_id)
+            self.version += 1
+            self._append_journal({'op': 'remove', 'id': bullet_id})
             return True
         return False
     
-    def get_bullet(self, identifier: str) -> Optional[TruthBullet]:
+    def get_bullet(self, identifier: str, allow_prefix: bool = False) -> Optional[TruthBullet]:
+        """Find a bullet by ID or name. With allow_prefix, a unique name prefix also matches."""
         # Try to get by ID first
         try:
             bullet_id = int(identifier)
             return self.bullets.get(bullet_id)
         except ValueError:
-            # If not an ID, try to find by name
-            for bullet in self.bullets.values():
-                if bullet.name.lower() == identifier.lower():
-                    return bullet
+            pass
+
+        # If not an ID, try to find by name
+        key = identifier.casefold()
+        ids = self._name_index.get(key)
+        if ids:
+            return self.bullets[ids[0]]
+
+        if allow_prefix:
+            names = self._names_with_prefix(key, limit=2)
+            if len(names) == 1:
+                return self.bullets[self._name_index[names[0]][0]]
         return None
     
+    def find_by_prefix(self, prefix: str, limit: int = 25) -> list[TruthBullet]:
+        """Return bullets whose name starts with prefix, in name order"""
+        names = self._names_with_prefix(prefix.casefold(), limit)
+        return [self.bullets[self._name_index[name][0]] for name in names]
+    
+    def suggest(self, identifier: str, limit: int = 5) -> list[TruthBullet]:
+        """Suggest bullets sharing the longest possible name prefix with identifier"""
+        key = identifier.casefold()
+        for end in range(len(key), 0, -1):
+            names = self._names_with_prefix(key[:end], limit)
+            if names:
+                return [self.bullets[self._name_index[name][0]] for name in names]
+        return []
+    
+    def search(self, query: str, limit: int = 10, snippets: bool = True) -> list[tuple[TruthBullet, Optional[str]]]:
+        """Full-text search over names and descriptions, best match first, with optional snippets"""
+        terms = tokenize(query)
+        results = []
+        for hit in self.search_index.search(query, limit):
+            bullet = self.bullets[hit.bullet_id]
+            snippet = make_snippet(bullet.description, terms) if snippets else None
+            results.append((bullet, snippet))
+        return results
+    
     def get_all_bullets(self) -> list[TruthBullet]:
         return sorted(self.bullets.values(), key=lambda x: x.id)
+    
+    def get_pages(self) -> List[discord.Embed]:
+        """Listing embeds for !bullets, rendered once per bullet-set version"""
+        if self._pages_version != self.version:
+            self._pages = render_pages(self.get_all_bullets())
+            self._pages_version = self.version
+        return self._pages
+
+class ManagerRegistry:
+    """Holds the TruthBulletManager of each guild.
+
+    In preload mode every guild's bullet file is loaded once at startup, in
+    parallel worker threads, and stays resident. Otherwise a manager is loaded
+    off the event loop on first access and the least recently used managers are
+    evicted once max_managers or max_bullets is exceeded.
+    """
+
+    def __init__(self, max_managers: Optional[int] = None, max_bullets: Optional[int] = None):
+        self.max_managers = max_managers
+        self.max_bullets = max_bullets
+        self.store = JsonBulletStore()
+        self._managers: OrderedDict[int, TruthBulletManager] = OrderedDict()
+        self._loading: Dict[int, asyncio.Task] = {}
+
+    def __len__(self):
+        return len(self._managers)
+
+    def __contains__(self, guild_id: int):
+        return guild_id in self._managers
+
+    def values(self):
+        return self._managers.values()
+
+    def configure(self, preload: bool, max_managers: Optional[int], max_bullets: Optional[int], store=None):
+        # Preloaded managers are meant to stay resident, so limits only apply to lazy mode
+        self.max_managers = None if preload else max_managers
+        self.max_bullets = None if preload else max_bullets
+        if store is not None:
+            self.store = store
+
+    async def get(self, guild_id: int) -> TruthBulletManager:
+        """Return the guild's manager, loading it from disk if it isn't resident"""
+        manager = self._managers.get(guild_id)
+        if manager is not None:
+            self._managers.move_to_end(guild_id)
+            return manager
+
+        # Concurrent first accesses share one load
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = self._loading[guild_id] = asyncio.create_task(self._load(guild_id))
+        return await asyncio.shield(task)
+
+    async def _load(self, guild_id: int) -> TruthBulletManager:
+        try:
+            # An evicted manager's last writes may still be in flight
+            await bullet_writer.wait_for(guild_id)
+            manager = await asyncio.to_thread(TruthBulletManager, guild_id, self.store)
+        finally:
+            del self._loading[guild_id]
+        self._managers[guild_id] = manager
+        self._evict(keep=guild_id)
+        return manager
+
+    def _evict(self, keep: int):
+        def over_limit():
+            if self.max_managers is not None and len(self._managers) > self.max_managers:
+                return True
+            if self.max_bullets is not None:
+                return sum(len(m.bullets) for m in self._managers.values()) > self.max_bullets
+            return False
+
+        while len(self._managers) > 1 and over_limit():
+            guild_id = next(iter(self._managers))
+            if guild_id == keep:
+                self._managers.move_to_end(guild_id)
+                continue
+            # Hand over its unwritten changes before letting it go
+            bullet_writer.submit(self._managers.pop(guild_id))
+
+    def stored_guild_ids(self) -> set[int]:
+        """Guild IDs that have bullets in the store"""
+        return self.store.stored_guild_ids()
+
+    async def preload(self, guild_ids: Optional[Iterable[int]] = None):
+        """Load the managers of every guild with stored bullets in parallel"""
+        if guild_ids is None:
+            guild_ids = await asyncio.to_thread(self.stored_guild_ids)
+        await asyncio.gather(*(self.get(guild_id) for guild_id in guild_ids))
 
-# Dictionary to store TruthBulletManager instances for each guild
-guild_managers: Dict[int, TruthBulletManager] = {} 
\ No newline at end of file
+# Registry of TruthBulletManager instances for each guild
+guild_managers = ManagerRegistry() 
\ No newline at end of file
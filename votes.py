@@ -0,0 +1,72 @@
+from typing import Dict, Optional, Tuple
+
+# Reaction emojis for the two options of each kind of vote
+VOTE_OPTIONS = {
+    'scrum': ("🔵", "🔴"),
+    'refute': ("1️⃣", "2️⃣"),
+}
+
+class VoteEngine:
+    """Counts votes live from raw reaction events, one vote per user.
+
+    Works directly on the active_votes records so ballots are persisted along
+    with the rest of the trial state. Each record keeps 'ballots' (user ID ->
+    option index) and running 'counts', so every update and every tally is O(1)
+    and ending a vote never needs to fetch the message. Reacting with the other
+    option moves a user's vote; removing the reaction they voted with retracts it.
+    """
+
+    def __init__(self, votes: Dict[int, dict]):
+        self.votes = votes
+
+    @staticmethod
+    def options(vote_data: dict) -> Tuple[str, str]:
+        return VOTE_OPTIONS['scrum' if vote_data.get('type') == 'scrum' else 'refute']
+
+    def open(self, key: int, vote_data: dict):
+        vote_data['ballots'] = {}
+        vote_data['counts'] = [0, 0]
+        self.votes[key] = vote_data
+
+    def _find(self, key: int, message_id: int, emoji: str) -> Tuple[Optional[dict], Optional[int]]:
+        vote_data = self.votes.get(key)
+        if vote_data is None or vote_data['message_id'] != message_id:
+            return None, None
+        options = self.options(vote_data)
+        if emoji not in options:
+            return None, None
+        vote_data.setdefault('ballots', {})
+        vote_data.setdefault('counts', [0, 0])
+        return vote_data, options.index(emoji)
+
+    def add(self, key: int, message_id: int, user_id: int, emoji: str) -> bool:
+        """Record a reaction as a vote. Returns True if the tally changed."""
+        vote_data, choice = self._find(key, message_id, emoji)
+        if vote_data is None:
+            return False
+        # JSON object keys are strings, so ballots are keyed the same way in memory
+        voter = str(user_id)
+        previous = vote_data['ballots'].get(voter)
+        if previous == choice:
+            return False
+        if previous is not None:
+            vote_data['counts'][previous] -= 1
+        vote_data['ballots'][voter] = choice
+        vote_data['counts'][choice] += 1
+        return True
+
+    def remove(self, key: int, message_id: int, user_id: int, emoji: str) -> bool:
+        """Retract a vote when its reaction is removed. Returns True if the tally changed."""
+        vote_data, choice = self._find(key, message_id, emoji)
+        if vote_data is None:
+            return False
+        voter = str(user_id)
+        if vote_data['ballots'].get(voter) != choice:
+            return False
+        del vote_data['ballots'][voter]
+        vote_data['counts'][choice] -= 1
+        return True
+
+    def tally(self, key: int) -> Tuple[int, int]:
+        votes_a, votes_b = self.votes[key].get('counts', [0, 0])
+        return votes_a, votes_b